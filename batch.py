@@ -0,0 +1,247 @@
+"""
+program: batch.py
+
+purpose: run a filter, its statistics and plots from the command line,
+         without the user interface.
+
+comments: Uses the same filter syntax as the filter rows of the application:
+          each --filter takes a column and a criterion, e.g.
+
+              python batch.py data/strain_nml_sample.csv \
+                  --filter age '>55' --filter gender '!=M' \
+                  --data filtered.csv --stats stats.txt \
+                  --plot scatter age rest_EF scatter.png --category gender
+
+          Column names are those of the application, with spaces replaced
+          by underscores (clean_column_names).
+
+          --where takes a filter expression instead, which may use or, not
+          and parentheses (data_core.parse_filter), e.g.
+              --where '(age>70 | TID>1.1) & !(gender=M)'
+
+          With --filter-set (repeatable), the statistics are computed for
+          each filter set instead, in one pass, and --stats gets one block
+          per set. A filter set is written like the plot titles, e.g.
+              --filter-set 'age>55 & gender=M' --filter-set 'age>55 & gender=F'
+          and may also be a filter expression, like --where.
+
+          With --group-by COLUMN, the statistics table has a block for each
+          value of the column (stats_engine.group_stats).
+
+          --engine polars runs the filter and statistics with Polars
+          (plan.PolarsEngine), if it is installed.
+
+          Outputs:
+              --data   the filtered records (csv)
+              --stats  the statistics table; as text like the stats panel if
+                       the name ends in .txt, else csv
+              --plot   KIND X Y PATH, with KIND one of line, bar, scatter;
+                       may be repeated. The image format follows the
+                       extension of PATH (e.g. png).
+
+          Neither tkinter nor ttkthemes is imported, and matplotlib is only
+          imported when a plot is requested; figures are drawn with the Agg
+          renderer, so no display is needed.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Add --filter-set.
+10-18-2026  Add --group-by.
+10-18-2026  Add --engine.
+10-18-2026  Add --where; --filter-set takes filter expressions.
+10-18-2026  Report an unknown --group-by column as a usage error.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+import data_core as core
+import plot_prep
+from plan import Plan, PandasEngine, PolarsEngine
+from data_loader import DatasetCache
+
+line_max_points = 2_000       # larger line plots are downsampled (LTTB)
+bar_max_bars = 100            # larger bar plots are aggregated by x
+scatter_max_points = 50_000   # larger scatter plots are binned or sampled
+
+
+def read_dataset(path: str) -> pd.DataFrame:
+    """The cleaned, categorized dataset: from the application's cache if valid."""
+    data = DatasetCache(path).read()
+    if data is not None:
+        return data
+
+    data = core.clean_column_names(pd.read_csv(path))
+
+    return core.categorize_columns(data)
+
+
+def write_stats(stats: pd.DataFrame, path: str) -> None:
+    if path.endswith('.txt'):
+        with pd.option_context('display.float_format', '{:0.2f}'.format):
+            text = stats.to_string()
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+    else:
+        stats.to_csv(path)
+
+
+def write_plot(data: pd.DataFrame,
+               kind: str,
+               xcol: str,
+               ycol: str,
+               path: str,
+               title: str,
+               category: str | None = None,
+               how: str = 'auto') -> None:
+    """Draw one plot of the data, and save it to path."""
+    from matplotlib.figure import Figure
+    import matplotlib.colors as mcolors
+
+    fig = Figure(figsize=(6.4, 4.8), layout='constrained')
+    ax = fig.add_subplot()
+
+    match kind:
+        case 'line':
+            sorted = plot_prep.line_data(data, xcol, ycol, line_max_points)
+            ax.plot(plot_prep.plot_values(sorted[xcol]),
+                    plot_prep.plot_values(sorted[ycol]))
+        case 'bar':
+            bars = plot_prep.bar_data(data, xcol, ycol, how, bar_max_bars)
+            ycol = bars.columns[1]
+            positions = np.arange(len(bars))
+            ax.bar(positions, plot_prep.plot_values(bars[ycol]))
+            ax.set_xticks(positions, plot_prep.tick_labels(bars[xcol]), rotation=90)
+        case 'scatter':
+            if len(data) > scatter_max_points and category is None:
+                counts, xedges, yedges = plot_prep.density_grid(data, xcol, ycol)
+                mesh = ax.pcolormesh(xedges, yedges,
+                                     np.ma.masked_equal(counts, 0),
+                                     cmap='viridis',
+                                     norm=mcolors.LogNorm())
+                fig.colorbar(mesh, ax=ax, label='records')
+            else:
+                points = plot_prep.stratified_sample(data, scatter_max_points, category)
+                if category is None:
+                    ax.scatter(plot_prep.plot_values(points[xcol]),
+                               plot_prep.plot_values(points[ycol]),
+                               alpha=0.5, s=40)
+                else:
+                    for name in points[category].cat.categories:
+                        group = points[points[category] == name]
+                        ax.scatter(plot_prep.plot_values(group[xcol]),
+                                   plot_prep.plot_values(group[ycol]),
+                                   alpha=0.5, s=40, label=str(name))
+                    ax.legend()
+        case _:
+            raise ValueError(f'unknown plot kind: {kind}')
+
+    ax.set_xlabel(xcol)
+    ax.set_ylabel(ycol)
+    ax.set_title(title)
+    fig.savefig(path)
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Filter a csv dataset; write the records, statistics and plots.')
+    parser.add_argument('csv', help='the dataset')
+    parser.add_argument('--filter', nargs=2, action='append', default=[],
+                        metavar=('COLUMN', 'CRITERION'),
+                        help="a filter term, e.g. age '>55'; terms are combined with 'and'")
+    parser.add_argument('--where', metavar='EXPR',
+                        help="a filter expression, e.g. 'age>70 | TID>1.1' (not with --filter)")
+    parser.add_argument('--filter-set', action='append', default=[], metavar='FILTER',
+                        help="statistics for each filter set, e.g. 'age>55 & gender=M'")
+    parser.add_argument('--group-by', metavar='COLUMN',
+                        help='statistics for each value of a category column')
+    parser.add_argument('--engine', default='pandas', choices=['pandas', 'polars'],
+                        help='runs the filter and statistics (polars must be installed)')
+    parser.add_argument('--data', metavar='PATH', help='write the filtered records (csv)')
+    parser.add_argument('--stats', metavar='PATH', help='write the statistics table')
+    parser.add_argument('--plot', nargs=4, action='append', default=[],
+                        metavar=('KIND', 'X', 'Y', 'PATH'),
+                        help='write a line, bar or scatter plot of Y against X')
+    parser.add_argument('--category', help='scatter plots: color by this column')
+    parser.add_argument('--agg', default='auto', choices=['auto', 'mean', 'median', 'count'],
+                        help='bar plots: aggregate of Y for each X')
+    args = parser.parse_args(argv)
+
+    data = read_dataset(args.csv)
+
+    if args.filter_set:
+        try:
+            stats = core.filter_sets_stats(data, args.filter_set)
+        except ValueError as exc:
+            print(f'filter error: {exc}', file=sys.stderr)
+            return 2
+        if args.stats:
+            write_stats(stats, args.stats)
+        else:
+            with pd.option_context('display.float_format', '{:0.2f}'.format):
+                print(stats.to_string())
+        return 0
+
+    if args.where and args.filter:
+        parser.error('use either --filter or --where')
+
+    for column, _ in args.filter:
+        if column not in data.columns:
+            parser.error(f'unknown column: {column}')
+    if args.group_by is not None and args.group_by not in data.columns:
+        parser.error(f'unknown column: {args.group_by}')
+
+    expr = None
+    summary = 'All Data'
+    if args.where:
+        try:
+            expr = core.make_filter_expression(data, args.where)
+        except ValueError as exc:
+            print(f'filter error: {exc}', file=sys.stderr)
+            return 2
+        summary = str(expr).replace('==', '=')
+    elif args.filter:
+        expr, err = core.make_filter(data, args.filter)
+        if isinstance(expr, int):
+            print(f'filter error: {core.filter_errors[err]}', file=sys.stderr)
+            return 2
+        if err:
+            print(f'warning: {core.filter_errors[err]}', file=sys.stderr)
+        summary = str(expr).replace('==', '=')
+
+    if args.engine == 'polars':
+        engine = PolarsEngine()
+    else:
+        engine = PandasEngine()
+
+    selection, stats = core.filter_stats(data, expr, engine)
+    if args.group_by:
+        stats = (Plan(data).filter(expr).group_by(args.group_by)
+                 .agg(core.stat_list, core.stats_columns(data)).collect(engine))
+    print(f'{summary}: {len(selection)} of {len(data)} records')
+
+    if args.data:
+        selection.to_csv(args.data, index=False)
+    if args.stats:
+        write_stats(stats, args.stats)
+
+    category = args.category
+    if category is not None and not isinstance(selection[category].dtype, pd.CategoricalDtype):
+        selection = selection.assign(**{category: selection[category].astype('category')})
+
+    for kind, xcol, ycol, path in args.plot:
+        write_plot(selection, kind, xcol, ycol, path,
+                   f'{summary} (n = {len(selection)})',
+                   category=category, how=args.agg)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+program: benchmark.py
+
+purpose: time the data operations of the application on synthetic strain
+         datasets of increasing size, and write the timings as JSON.
+
+comments: make_strain_data() generates records shaped like
+          data/strain_nml_sample.csv (pt code, gender, age, TID, stress EF,
+          rest EF), with similar ranges. Each size is written to a csv file
+          (in chunks, so 10^8 rows don't need to fit in memory as text) and
+          then timed, step by step, as the application does the work:
+
+              load_csv            pd.read_csv of the file
+              clean_column_names  data_core.clean_column_names
+              categorize_columns  data_core.categorize_columns
+              build_indexes       column_index.ColumnIndexes
+              column_stats        column_stats.ColumnStats (from the indexes)
+              make_filter         data_core.make_filter, for filter_criteria
+              apply_filter        the filter mask, without and with indexes
+              agg_stats_dict      DataFrame.agg(stats_dict) of the selection
+              masked_stats        stats_engine.masked_stats of the selection
+              render_rows         one page of the selection as text
+                                  (row_selection.format_rows)
+              render_stats        the statistics table as text
+              line_data, bar_data, scatter_arrays, density_grid
+                                  the plot data preparation (plot_prep)
+
+          Each step is run `repeat` times; the JSON has every run and the
+          best one. To compare versions, run the same sizes with each and
+          pass the earlier file to --compare, e.g.
+
+              python benchmark.py --rows 1e3 1e5 1e7 --output new.json \
+                  --compare old.json
+
+          which prints the ratio new / old of each step (above 1: slower).
+
+          Only the modules without a user interface are imported; no window
+          is opened.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Add the column_stats step.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_core as core
+import plot_prep
+from column_index import ColumnIndexes
+from column_stats import ColumnStats
+from plan import Plan
+from row_selection import format_rows, select_columns
+from stats_engine import masked_stats
+
+filter_criteria = [('age', '>55'), ('gender', '=M')]
+page_rows = 40                  # rows rendered, about one page of the data window
+plot_columns = ('age', 'rest_EF')
+
+
+def make_strain_data(nrows: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic strain records, with the columns of the sample csv."""
+    rng = np.random.default_rng(seed)
+
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    lower = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    code = (letters[rng.integers(0, 26, nrows)].astype(object) +
+            lower[rng.integers(0, 26, nrows)] +
+            lower[rng.integers(0, 26, nrows)] +
+            letters[rng.integers(0, 26, nrows)] +
+            lower[rng.integers(0, 26, nrows)])
+
+    rest_ef = np.clip(rng.normal(66, 6, nrows).round(), 40, 85).astype(np.int64)
+
+    return pd.DataFrame({
+        'pt code': code,
+        'gender': rng.choice(['F', 'M', 'U'], nrows, p=[0.48, 0.48, 0.04]),
+        'age': rng.integers(30, 90, nrows),
+        'TID': np.clip(rng.normal(1.05, 0.09, nrows), 0.7, 1.4).round(2),
+        'stress EF': np.clip(rest_ef + rng.normal(7, 5, nrows).round(), 40, 90).astype(np.int64),
+        'rest EF': rest_ef})
+
+
+def write_strain_csv(path: str, nrows: int,
+                     chunksize: int = 1_000_000,
+                     seed: int = 0) -> None:
+    """Write nrows synthetic records to a csv file, chunksize at a time."""
+    written = 0
+    part = 0
+    while written < nrows:
+        n = min(chunksize, nrows - written)
+        chunk = make_strain_data(n, seed + part)
+        chunk.to_csv(path, mode='w' if part == 0 else 'a',
+                     header=(part == 0), index=False)
+        written += n
+        part += 1
+
+
+def timed(fn: callable, repeat: int) -> tuple:
+    """Run fn repeat times: (result of the last run, list of seconds)."""
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+
+    return result, seconds
+
+
+def run_size(path: str, nrows: int, repeat: int) -> list:
+    """Time each step on the csv file of nrows records."""
+    results = []
+
+    def step(name: str, fn: callable, runs: int = repeat) -> object:
+        result, seconds = timed(fn, runs)
+        results.append({'rows': nrows,
+                        'step': name,
+                        'best': min(seconds),
+                        'seconds': seconds})
+        return result
+
+    # the loading steps change the data, so they run once
+    data = step('load_csv', lambda: pd.read_csv(path), 1)
+    data = step('clean_column_names', lambda: core.clean_column_names(data), 1)
+    data = step('categorize_columns', lambda: core.categorize_columns(data), 1)
+
+    stats_columns = core.stats_columns(data)
+    stats_dict = {c: core.stat_list for c in stats_columns}
+    category_cols = [c for c in data.columns
+                     if isinstance(data[c].dtype, pd.CategoricalDtype)]
+    indexes = step('build_indexes',
+                   lambda: ColumnIndexes(data, stats_columns + category_cols))
+    step('column_stats', lambda: ColumnStats(data, indexes))
+
+    expr, err = step('make_filter', lambda: core.make_filter(data, filter_criteria))
+    if isinstance(expr, int):
+        raise ValueError(core.filter_errors[err])
+
+    step('apply_filter', lambda: Plan(data).filter(expr).rows())
+    selection = step('apply_filter_indexed',
+                     lambda: Plan(data, indexes=indexes).filter(expr).rows())
+    mask = np.zeros(len(data), dtype=bool)
+    mask[selection.rows] = True
+
+    stats = step('agg_stats_dict',
+                 lambda: select_columns(selection, stats_columns).agg(stats_dict))
+    step('masked_stats',
+         lambda: masked_stats(data, stats_columns, mask[np.newaxis], core.stat_list))
+
+    step('render_rows', lambda: format_rows(selection.iloc[0:page_rows], {}))
+    step('render_stats', lambda: str(stats))
+
+    xcol, ycol = plot_columns
+    step('line_data', lambda: plot_prep.line_data(selection, xcol, ycol, 2_000))
+    step('bar_data', lambda: plot_prep.bar_data(selection, xcol, ycol, 'auto', 100))
+
+    def scatter_arrays() -> tuple:
+        codes, categories = plot_prep.category_codes(data, ['gender'])['gender']
+        x = plot_prep.plot_values(selection[xcol])
+        y = plot_prep.plot_values(selection[ycol])
+        keep = plot_prep.stratified_rows(codes[selection.rows], 50_000)
+        return x[keep], y[keep]
+
+    step('scatter_arrays', scatter_arrays)
+    step('density_grid', lambda: plot_prep.density_grid(selection, xcol, ycol))
+
+    return results
+
+
+def version() -> str:
+    """The git commit of the working tree, if there is one."""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'],
+                              capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def compare(results: list, baseline: list) -> None:
+    """Print the ratio of each step's best time to that of the baseline."""
+    base = {(r['rows'], r['step']): r['best'] for r in baseline}
+    print(f'{"rows":>11}  {"step":<22}{"best (s)":>10}{"ratio":>8}')
+    for r in results:
+        old = base.get((r['rows'], r['step']))
+        ratio = f'{r["best"] / old:8.2f}' if old else f'{"-":>8}'
+        print(f'{r["rows"]:>11}  {r["step"]:<22}{r["best"]:10.4f}{ratio}')
+
+
+def main(argv: list | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Time the data operations on synthetic strain datasets.')
+    parser.add_argument('--rows', nargs='+', default=['1e3', '1e4', '1e5', '1e6'],
+                        help='dataset sizes, e.g. 1e3 1e6 (up to 1e8)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs of each step (loading steps run once)')
+    parser.add_argument('--dir', help='keep the generated csv files here')
+    parser.add_argument('--output', metavar='PATH', help='write the JSON here, not to stdout')
+    parser.add_argument('--compare', metavar='PATH', help='a JSON file of an earlier run')
+    args = parser.parse_args(argv)
+
+    sizes = [int(float(r)) for r in args.rows]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.dir or tmp
+        results = []
+        for nrows in sizes:
+            path = os.path.join(folder, f'strain_synthetic_{nrows}.csv')
+            if not os.path.exists(path):
+                write_strain_csv(path, nrows)
+            results += run_size(path, nrows, args.repeat)
+            print(f'{nrows} rows: done', file=sys.stderr)
+
+    report = {'version': version(),
+              'python': platform.python_version(),
+              'pandas': pd.__version__,
+              'numpy': np.__version__,
+              'machine': platform.machine(),
+              'filter': [list(c) for c in filter_criteria],
+              'results': results}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
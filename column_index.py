@@ -0,0 +1,141 @@
+"""
+program: column_index.py
+
+purpose: per-column indexes built once when a dataset is loaded, used to
+         answer filter terms without scanning the whole column.
+
+comments: SortedIndex holds the argsort of a numeric column and the sorted
+          values. A range or equality term (<, <=, >, >=, ==) is answered by
+          binary search: the matching rows are a contiguous slice of the
+          argsort, so they are found in O(log n) with no copy.
+          NaN values sort to the end and are never part of a result.
+
+          CategoryIndex does the same for the integer codes of a pandas
+          Categorical column: the rows of each category are a contiguous
+          slice of the argsort of the codes. '==' and '!=' terms on
+          low-cardinality string columns (e.g. gender) are answered without
+          any string comparison.
+
+          ColumnIndexes.count() gives the number of rows of a term without
+          making a copy; the filter planner uses it to estimate selectivity.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Add CategoryIndex for Categorical columns.
+10-18-2026  Add ColumnIndexes.count().
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class SortedIndex:
+    """argsort and sorted values of one numeric column."""
+
+    ops = ['<', '<=', '>', '>=', '==']
+
+    def __init__(self, values: np.ndarray):
+        order = np.argsort(values, kind='stable')
+        # row positions fit in 32 bits for any dataset we can hold in memory
+        if len(values) < 2 ** 31:
+            order = order.astype(np.int32)
+
+        self.order = order
+        self.sorted = values[order]
+        self.nvalid = len(values) - np.count_nonzero(np.isnan(self.sorted))
+
+    def positions(self, op: str, value: float) -> np.ndarray:
+        """Return the row positions (unordered) where: column op value."""
+        left = np.searchsorted(self.sorted[:self.nvalid], value, side='left')
+        right = np.searchsorted(self.sorted[:self.nvalid], value, side='right')
+
+        match op:
+            case '<':
+                return self.order[:left]
+            case '<=':
+                return self.order[:right]
+            case '>':
+                return self.order[right:self.nvalid]
+            case '>=':
+                return self.order[left:self.nvalid]
+            case '==':
+                return self.order[left:right]
+
+        raise ValueError(f'SortedIndex does not support op: {op}')
+
+
+class CategoryIndex:
+    """Row positions of each category of a Categorical column."""
+
+    ops = ['==', '!=']
+
+    def __init__(self, values: pd.Categorical):
+        self.categories = values.categories
+        # missing values have code -1, and sort first
+        self.codes = SortedIndex(values.codes.astype('float64'))
+
+    def positions(self, op: str, value: object) -> np.ndarray:
+        if value in self.categories:
+            code = self.categories.get_loc(value)
+        else:
+            code = np.nan
+
+        match op:
+            case '==':
+                return self.codes.positions('==', code)
+            case '!=':
+                # like query(), missing values are != any value
+                left = np.searchsorted(self.codes.sorted, code, side='left')
+                right = np.searchsorted(self.codes.sorted, code, side='right')
+                return np.concatenate([self.codes.order[:left],
+                                       self.codes.order[right:]])
+
+        raise ValueError(f'CategoryIndex does not support op: {op}')
+
+
+class ColumnIndexes:
+    """Indexes for the columns of one DataFrame.
+
+    Categorical columns get a CategoryIndex, other columns a SortedIndex.
+    """
+
+    def __init__(self, data: pd.DataFrame, columns: list):
+        self.data = data
+        self.sorted = {}
+        self.category = {}
+
+        for c in columns:
+            if isinstance(data[c].dtype, pd.CategoricalDtype):
+                self.category[c] = CategoryIndex(data[c].array)
+            else:
+                values = data[c].to_numpy(dtype='float64', na_value=np.nan)
+                self.sorted[c] = SortedIndex(values)
+
+    def positions(self, column: str, op: str, value: object) -> np.ndarray | None:
+        """Row positions for a term, or None if no index can answer it."""
+        if column in self.category:
+            index = self.category[column]
+        elif isinstance(value, str):
+            return None
+        else:
+            index = self.sorted.get(column)
+
+        if index is None or op not in index.ops:
+            return None
+
+        return index.positions(op, value)
+
+    def count(self, column: str, op: str, value: object) -> int | None:
+        """Number of rows for a term, or None if no index can answer it."""
+        if column in self.category and op == '!=':
+            # the rows of one category are a slice; the others would be copied
+            return len(self.data) - len(self.positions(column, '==', value))
+
+        rows = self.positions(column, op, value)
+        if rows is None:
+            return None
+
+        return len(rows)
@@ -0,0 +1,318 @@
+"""
+program: column_stats.py
+
+purpose: per-column statistics of a dataset, computed once when it is
+         loaded, to estimate how many rows a filter criterion selects
+         without reading the data.
+
+comments: For each column ColumnStats keeps the number of rows, of missing
+          values and of distinct values, and:
+          - for a numeric column with few distinct values (up to
+            max_values, e.g. age, EF), the count of each value, so every
+            estimate is exact;
+          - for other numeric columns (e.g. a continuous measure), an
+            equal-width histogram of nbins bins. A range criterion is
+            estimated from the bins below the value, and a fraction of the
+            bin it falls in; an equality criterion as the average number of
+            rows per distinct value.
+          - for Categorical and string columns, the counts of the max_values
+            most common values; a less common value gets the average count
+            of the others.
+
+          count(column, criterion) gives the expected number of rows for a
+          criterion as returned by data_core.set_criterion(), e.g.
+          {'op': '>', 'value': '55'}; None if it is not valid for the
+          column. selectivity(term) gives the expected fraction of rows for
+          a compiled term (filter_compile.Term), as filter_compile.Planner
+          expects of its estimate, and rows(expr) the expected rows of a
+          whole filter, assuming independent terms.
+
+          Like query(), missing values are only != a value.
+
+          The sorted values of a numeric column are taken from its
+          SortedIndex, when the column indexes are given, so the column is
+          not sorted twice. Without an index, the column is read in blocks
+          of block_rows (twice, if it needs a histogram), and no whole copy
+          of it is made: the distinct values are counted exactly while there
+          are up to max_values of them, then estimated from the
+          distinct_sample smallest hashes of the values (a KMV sketch).
+          The values of an Arrow string column are counted by
+          pyarrow.compute.value_counts, on the Arrow buffers.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Read a numeric column without an index in blocks; count the
+            values of an Arrow column with pyarrow.compute.
+"""
+
+import numpy as np
+import pandas as pd
+
+import filter_compile as fcomp
+
+try:
+    import pyarrow.compute as pc
+except ImportError:
+    pc = None
+
+
+def value_hashes(values: np.ndarray) -> np.ndarray:
+    """A 64-bit hash of each float64 value (the splitmix64 finalizer)."""
+    # + 0.0 makes -0.0 into 0.0, so both hash alike
+    h = (values + 0.0).view(np.uint64)
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+
+    return h ^ (h >> np.uint64(31))
+
+
+class NumericStats:
+    """Value counts, or a histogram, of one numeric column."""
+
+    def __init__(self, nrows: int, max_values: int, nbins: int):
+        self.nrows = nrows
+        self.max_values = max_values
+        self.nbins = nbins
+        self.nulls = nrows
+        self.distinct = 0
+        self.values = None
+        self.counts = None
+        self.edges = None
+        self.below = None
+
+    def load_sorted(self, sorted_values: np.ndarray) -> None:
+        """Count the values of the column, from its sorted valid values."""
+        max_values, nbins = self.max_values, self.nbins
+        self.nulls = self.nrows - len(sorted_values)
+
+        # the first position of each distinct value
+        starts = np.flatnonzero(np.diff(sorted_values)) + 1
+        self.distinct = len(starts) + 1 if len(sorted_values) else 0
+
+        if self.distinct <= max_values:
+            bounds = np.concatenate([[0], starts, [len(sorted_values)]]).astype(np.int64)
+            if len(sorted_values) == 0:
+                bounds = bounds[1:]
+            self.values = sorted_values[bounds[:-1]]
+            self.counts = np.diff(bounds)
+        else:
+            self.counts, self.edges = np.histogram(sorted_values, bins=nbins)
+
+        # rows below each value, or below each bin edge
+        self.below = np.concatenate([[0], np.cumsum(self.counts)])
+
+    def scan(self, values: pd.Series, block_rows: int, distinct_sample: int) -> None:
+        """Count the values of the column, reading it block_rows at a time."""
+        uniques = np.empty(0)
+        counts = np.empty(0, dtype=np.int64)
+        hashes = np.empty(0, dtype=np.uint64)
+        lo, hi = np.inf, -np.inf
+        nvalid = 0
+        for v in self._blocks(values, block_rows):
+            nvalid += v.size
+            lo, hi = min(lo, v.min()), max(hi, v.max())
+            u, n = np.unique(v, return_counts=True)
+            hashes = np.union1d(hashes, value_hashes(u))[:distinct_sample]
+            if uniques is None:
+                continue
+            uniques, inverse = np.unique(np.concatenate([uniques, u]), return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate([counts, n]),
+                                 minlength=len(uniques)).astype(np.int64)
+            if len(uniques) > self.max_values:
+                # too many values to count each: make a histogram instead
+                uniques = None
+
+        self.nulls = self.nrows - nvalid
+        if uniques is not None:
+            self.distinct = len(uniques)
+            self.values, self.counts = uniques, counts
+        else:
+            if len(hashes) < distinct_sample:
+                self.distinct = len(hashes)
+            else:
+                # the k smallest of n uniform hashes end near k / n of the range
+                self.distinct = min(nvalid, int((distinct_sample - 1) * 2.0**64 /
+                                                (float(hashes[-1]) + 1)))
+            self.counts = np.zeros(self.nbins, dtype=np.int64)
+            for v in self._blocks(values, block_rows):
+                self.counts += np.histogram(v, bins=self.nbins, range=(lo, hi))[0]
+            self.edges = np.histogram_bin_edges([lo, hi], bins=self.nbins)
+
+        self.below = np.concatenate([[0], np.cumsum(self.counts)])
+
+    def _blocks(self, values: pd.Series, block_rows: int) -> object:
+        """The valid values of the column as float64, in blocks."""
+        for start in range(0, self.nrows, block_rows):
+            v = values.iloc[start:start + block_rows].to_numpy(dtype='float64',
+                                                              na_value=np.nan)
+            v = v[~np.isnan(v)]
+            if v.size:
+                yield v
+
+    def count(self, op: str, value: float) -> float:
+        valid = self.nrows - self.nulls
+        if self.values is not None:
+            left = self.below[np.searchsorted(self.values, value, side='left')]
+            right = self.below[np.searchsorted(self.values, value, side='right')]
+        else:
+            equal = valid / self.distinct if self.distinct else 0.0
+            if value < self.edges[0] or value > self.edges[-1]:
+                equal = 0.0
+            left = self.rows_below(value)
+            right = min(left + equal, valid)
+
+        match op:
+            case '<':
+                return left
+            case '<=':
+                return right
+            case '>':
+                return valid - right
+            case '>=':
+                return valid - left
+            case '==':
+                return right - left
+            case '!=':
+                return self.nrows - (right - left)
+
+        raise ValueError(f'unknown op: {op}')
+
+    def rows_below(self, value: float) -> float:
+        """Histogram: rows < value, interpolated within its bin."""
+        if value <= self.edges[0]:
+            return 0.0
+        if value >= self.edges[-1]:
+            return float(self.below[-1])
+
+        i = int(np.searchsorted(self.edges, value, side='right')) - 1
+        part = (value - self.edges[i]) / (self.edges[i + 1] - self.edges[i])
+
+        return float(self.below[i] + part * self.counts[i])
+
+
+class ValueStats:
+    """Counts of the most common values of one Categorical or string column."""
+
+    def __init__(self, values: pd.Series, max_values: int):
+        self.nrows = len(values)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = values.array.codes, values.array.categories
+            # missing values have code -1
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        elif isinstance(values.dtype, pd.ArrowDtype) and pc is not None:
+            # counted on the Arrow buffers; missing values are counted as null
+            counted = pc.value_counts(values.array.__arrow_array__())
+            counted = counted.filter(counted.field('values').is_valid())
+            uniques = counted.field('values')
+            counts = counted.field('counts').to_numpy()
+        else:
+            codes, uniques = pd.factorize(values.to_numpy())
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        present = np.flatnonzero(counts)
+
+        self.nulls = self.nrows - int(counts.sum())
+        self.distinct = len(present)
+        self.complete = self.distinct <= max_values
+
+        if self.complete:
+            top = present
+        else:
+            top = present[np.argpartition(counts[present], -max_values)[-max_values:]]
+        self.counts = {str(uniques[i]): int(counts[i]) for i in top}
+        others = self.distinct - len(top)
+        # the average count of the values that are not kept
+        self.other = (counts.sum() - counts[top].sum()) / others if others else 0.0
+
+    def count(self, op: str, value: str) -> float:
+        valid = self.nrows - self.nulls
+        equal = self.counts.get(value, 0 if self.complete else self.other)
+
+        match op:
+            case '==':
+                return equal
+            case '!=':
+                return self.nrows - equal
+
+        if not self.complete:
+            return valid * fcomp.Planner.default_selectivity[op]
+
+        test = fcomp.OPS[op]
+        return float(sum(n for v, n in self.counts.items() if test(v, value)))
+
+
+class ColumnStats:
+    """Statistics of the columns of one DataFrame, for row count estimates."""
+
+    def __init__(self, data: pd.DataFrame,
+                 indexes: object = None,
+                 max_values: int = 1_000,
+                 nbins: int = 64,
+                 block_rows: int = 1 << 20,
+                 distinct_sample: int = 1024):
+        self.data = data
+        self.nrows = len(data)
+        self.columns = {}
+
+        for c in data.columns:
+            dtype = data[c].dtype
+            if (isinstance(dtype, pd.CategoricalDtype) or
+                    not (pd.api.types.is_integer_dtype(dtype) or
+                         pd.api.types.is_float_dtype(dtype))):
+                self.columns[c] = ValueStats(data[c], max_values)
+                continue
+
+            stats = NumericStats(self.nrows, max_values, nbins)
+            index = None
+            if indexes is not None and indexes.data is data:
+                index = indexes.sorted.get(c)
+            if index is not None:
+                stats.load_sorted(index.sorted[:index.nvalid])
+            else:
+                stats.scan(data[c], block_rows, distinct_sample)
+            self.columns[c] = stats
+
+    def nulls(self, column: str) -> int:
+        return self.columns[column].nulls
+
+    def distinct(self, column: str) -> int:
+        return self.columns[column].distinct
+
+    def term_count(self, column: str, op: str, value: object) -> float | None:
+        """Expected rows for: column op value; None if it can't be estimated."""
+        stats = self.columns.get(column)
+        if stats is None or op not in fcomp.OPS:
+            return None
+
+        if isinstance(stats, NumericStats):
+            if isinstance(value, str):
+                try:
+                    value = float(value)
+                except ValueError:
+                    return None
+            if stats.distinct == 0:
+                return float(stats.nrows if op == '!=' else 0)
+            return float(stats.count(op, value))
+
+        if not isinstance(value, str):
+            return None
+
+        return float(stats.count(op, value))
+
+    def count(self, column: str, criterion: dict) -> float | None:
+        """Expected rows for a criterion of data_core.set_criterion()."""
+        return self.term_count(column, criterion['op'], criterion['value'])
+
+    def selectivity(self, term: fcomp.Term) -> float | None:
+        """Expected fraction of rows for a compiled term (Planner estimate)."""
+        count = self.term_count(term.column, term.op, term.value)
+        if count is None or self.nrows == 0:
+            return None
+
+        return count / self.nrows
+
+    def rows(self, expr: object) -> float:
+        """Expected rows of a compiled filter, assuming independent terms."""
+        return self.nrows * fcomp.Planner(self.data, estimate=self.selectivity).selectivity(expr)
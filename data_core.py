@@ -0,0 +1,443 @@
+"""
+program: data_core.py
+
+purpose: the data operations of the application, without any user
+         interface: dataset preparation, filter construction and checking,
+         and the statistics table.
+
+comments: main.py builds the tkinter UI at import, so its functions can't
+          be used by other programs. The functions here take plain values
+          (e.g. a list of (column, criterion) strings instead of the filter
+          rows of the UI), and never import tkinter. They are used by
+          main.py and by the batch command line program (batch.py).
+
+          Filter error codes, as returned by make_filter():
+              -1  data item (column) not specified
+              -2  criterion not specified (non-fatal, if other rows are valid)
+              -3  no filter defined
+              -4  numeric criterion for string data, e.g. gender >55
+              -5  string criterion for numeric data, e.g. age older
+
+          Several filter sets (e.g. each gender crossed with age bands) are
+          evaluated together by filter_sets_stats(): each distinct term is
+          evaluated once, and the statistics of all sets are computed from
+          the matrix of their masks (stats_engine.masked_stats).
+
+          A filter expression may combine terms with & (and), | (or), ! (not)
+          and parentheses, e.g. '(age>70 | TID>1.1) & !(gender=M)';
+          make_filter_expression() parses it (parse_filter) and compiles
+          it. The words and, or, not may be used for &, |, !.
+
+          ResultCache keeps recent results computed from one dataset, such
+          as the grouped statistics of each (filter, group column).
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation, from functions of main.py
+10-18-2026  Add filter sets: parse_filter_set(), cross_filter_sets() and
+            filter_sets_stats().
+10-18-2026  Add ResultCache.
+10-18-2026  filter_stats() runs a Plan, with a choice of engine.
+10-18-2026  Add parse_filter() and make_filter_expression(), for filters with
+            or and not; filter_sets_stats() accepts filter expressions.
+10-18-2026  Remove parse_filter_set() and cross_filter_sets(), not used since
+            filter sets are expressions. filter_sets_stats() rejects a set
+            of pairs with any invalid term, as it does an expression.
+10-18-2026  categorize_columns() converts Arrow string columns as well.
+"""
+
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import filter_compile as fcomp
+from stats_engine import masked_stats
+from plan import Plan
+
+do_debug = False      # print statements for debug
+
+# for a good summary of skew and kurtosis, see medium.com
+stat_list = ['mean', 'std', 'min', 'median', 'max', 'skew', 'kurtosis']
+
+filter_errors = {-1: 'Data item not specified.',
+                 -2: 'At least one invalid filter criterion.',
+                 -3: 'No filter defined.',
+                 -4: "Can't compare numeric filter to string data.",
+                 -5: "Can't compare filter string to numeric data."}
+
+
+class ResultCache:
+    """Size-bounded LRU cache of results computed from one dataset.
+
+    Like filter_compile.MaskCache, the cache belongs to a single DataFrame
+    object: a lookup for a different object clears it.
+    """
+
+    def __init__(self, maxsize: int = 16):
+        self.maxsize = maxsize
+        self.data = None
+        self.results = OrderedDict()
+
+    def get(self, data: pd.DataFrame, key: tuple) -> object | None:
+        if data is not self.data:
+            self.results.clear()
+            self.data = data
+            return None
+
+        if key not in self.results:
+            return None
+
+        self.results.move_to_end(key)
+        return self.results[key]
+
+    def put(self, data: pd.DataFrame, key: tuple, result: object) -> None:
+        if data is not self.data:
+            self.results.clear()
+            self.data = data
+
+        self.results[key] = result
+        if len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+
+
+def clean_column_names(df: pd.core.frame.DataFrame) -> pd.core.frame.DataFrame:
+    """Convert single spaces in column names to underscore character."""
+
+    cols0 = df.columns
+    cols1 = cols0.map(lambda x: x.replace(' ', '_') if isinstance(x, str) else x)
+    df.columns = cols1
+
+    return df
+
+
+def numeric_type(data_type: object) -> bool:
+    """True for integer and float columns, numpy or Arrow backed."""
+    return (pd.api.types.is_integer_dtype(data_type) or
+            pd.api.types.is_float_dtype(data_type))
+
+
+def categorize_columns(df: pd.core.frame.DataFrame,
+                       max_categories: int = 50) -> pd.core.frame.DataFrame:
+    """Convert string columns with few distinct values to Categorical.
+
+    A column qualifies if it has no more than max_categories values, and
+    they repeat (fewer distinct values than half the number of rows).
+    String columns are object columns, or Arrow strings (Arrow mode).
+    """
+    for c in df.columns:
+        if pd.api.types.is_string_dtype(df[c].dtype):
+            ndistinct = df[c].nunique()
+            if ndistinct <= max_categories and ndistinct < len(df) / 2:
+                df[c] = df[c].astype('category')
+
+    return df
+
+
+def stats_columns(data: pd.DataFrame) -> list:
+    """The columns that have statistics: integer and float columns."""
+    return [c for c in data.columns if numeric_type(data[c].dtype)]
+
+
+def make_filter(data: pd.core.frame.DataFrame,
+                criteria: list) -> tuple[int | fcomp.And, int]:
+    """Construct a data filter from (column, criterion) pairs, e.g. ('age', '>55').
+
+    Returns (filter, err): the compiled filter (str() gives the expression)
+    or, if no term is valid, the error code; and the error code of the
+    invalid rows, 0 if there are none.
+    """
+    terms = []
+    err = 0  # False == no error
+
+    for this_filter, this_criterion in criteria:
+        valid_criterion = ''
+
+        if this_filter == '':
+            err = -1
+
+        if this_criterion == '':
+            err += -2
+        else:
+            valid_criterion = set_criterion(this_criterion)
+
+        if err == 0:
+            data_type = data[this_filter].dtype
+
+            filter_check = check_filter_data(valid_criterion['value'], data_type)
+
+            if filter_check['err'] == 0:
+                terms.append(fcomp.compile_term(this_filter,
+                                                valid_criterion,
+                                                filter_check['quote']))
+            else:
+                err = filter_check['err']
+
+    if err and terms == []:
+        return err, err
+
+    return fcomp.compile_filter(terms), err
+
+
+def set_criterion(inp: list) -> dict:
+    """Validate user-entered criterion for filtering data."""
+    op = ''
+    value = ''
+
+    # this definition is not required...
+    criterion = {'op': op,
+                 'value': value}
+
+    char1 = inp[0]
+    if len(inp) > 1:
+        char2 = inp[1]
+    else:
+        char2 = ''
+
+    if char1 in ['!', '=', '>', '<']:
+        if char2 == '=':
+            value = inp[2:]
+            op = inp[0:2]
+        else:
+            value = inp[1:]
+            match char1:
+                case '!':
+                    op = '!='
+                case '=':
+                    op = '=='
+                case _:
+                    op = char1
+    else:
+        op = '=='
+        value = inp
+
+    criterion['op'] = op
+    criterion['value'] = value
+
+    if do_debug:
+        print(f'in function: {sys._getframe().f_code.co_name}')
+        print(f'...called by: {sys._getframe().f_back.f_code.co_name}')
+        print(f'vallidate input: {inp}')
+        print()
+        print(f'char1, char2: {char1}, {char2}')
+        if char1 not in ['!', '=', '>', '<']:
+            print(f'setting filter criterion to: ' == ' {value}')
+        print(f'validated op, value: {op}, {value}')
+        print('---------')
+        print()
+
+    return criterion
+
+
+def check_filter_data(value, data_type):
+    """Check for mismatch between data type and the filter criterion."""
+    data_status = {'err': 0, 'quote': ''}
+
+    # ...int or float will pass this test
+    if value.replace('.', '', 1).isnumeric():
+        if (pd.api.types.is_string_dtype(data_type) or
+                isinstance(data_type, pd.CategoricalDtype)):
+            data_status['err'] = -4
+    else:
+        # value to check is not numeric, see if data is numeric
+        if numeric_type(data_type):
+            data_status['err'] = -5
+        data_status['quote'] = '\"'
+
+    return data_status
+
+
+def filter_stats(data: pd.DataFrame,
+                 expr: fcomp.And | None,
+                 engine: object = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Filter the data (None: no filter); return it and its statistics table.
+
+    engine runs the plan (plan.py); the default is pandas.
+    """
+    plan = Plan(data).filter(expr)
+
+    return plan.collect(engine), plan.agg(stat_list, stats_columns(data)).collect(engine)
+
+
+def split_term(term: str) -> tuple:
+    """(column, criterion) of one term in its display form, e.g. 'age>55'."""
+    start = len(term)
+    for op_char in '!=<>':
+        pos = term.find(op_char)
+        if pos >= 0:
+            start = min(start, pos)
+    end = start
+    while end < len(term) and term[end] in '!=<>':
+        end += 1
+
+    value = term[end:].strip().strip('"\'')
+
+    return term[:start].strip(), term[start:end] + value
+
+
+filter_words = {'and': '&', 'or': '|', 'not': '!'}
+
+
+def filter_tokens(text: str) -> list:
+    """The tokens of a filter expression: '(', ')', '&', '|', '!' and terms."""
+    tokens = []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch.isspace():
+            i += 1
+            continue
+        if ch in '()&|' or (ch == '!' and text[i + 1:i + 2] != '='):
+            tokens.append(ch)
+            i += 1
+            continue
+
+        word = text[i:].split(None, 1)[0].split('(', 1)[0].lower()
+        if word in filter_words:
+            tokens.append(filter_words[word])
+            i += len(word)
+            continue
+
+        # a term: up to an operator or paren, or a word that is one
+        j = i
+        quote = None
+        while j < len(text):
+            c = text[j]
+            if quote is not None:
+                if c == quote:
+                    quote = None
+            elif c in '"\'':
+                quote = c
+            elif c in '()&|':
+                break
+            elif c.isspace():
+                rest = text[j:].split(None, 1)
+                if rest and rest[0].split('(', 1)[0].lower() in filter_words:
+                    break
+            j += 1
+        tokens.append(text[i:j].strip())
+        i = j
+
+    return tokens
+
+
+def parse_filter(text: str) -> tuple:
+    """The tree of a filter expression, e.g. 'age>70 | !(gender=M)' gives
+    ('or', [('term', 'age', '>70'), ('not', ('term', 'gender', '=M'))]).
+
+    & binds more tightly than |. Raises ValueError for a syntax error.
+    """
+    tokens = filter_tokens(text)
+    pos = 0
+
+    def peek() -> str | None:
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take() -> str:
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def group(op: str, operand: callable) -> tuple:
+        items = [operand()]
+        while peek() == op:
+            take()
+            items.append(operand())
+        if len(items) == 1:
+            return items[0]
+        return ('and' if op == '&' else 'or', items)
+
+    def unary() -> tuple:
+        token = peek()
+        if token is None:
+            raise ValueError('incomplete filter expression')
+        if token == '!':
+            take()
+            return ('not', unary())
+        if token == '(':
+            take()
+            node = group('|', lambda: group('&', unary))
+            if peek() != ')':
+                raise ValueError("missing ')' in filter expression")
+            take()
+            return node
+        if token in ')&|':
+            raise ValueError(f"unexpected '{token}' in filter expression")
+
+        return ('term',) + split_term(take())
+
+    tree = group('|', lambda: group('&', unary))
+    if peek() is not None:
+        raise ValueError(f"unexpected '{peek()}' in filter expression")
+
+    return tree
+
+
+def make_filter_expression(data: pd.DataFrame, text: str) -> fcomp.And:
+    """Compile a filter expression with and, or, not (see parse_filter).
+
+    The result is an And node, like make_filter(). Raises ValueError for a
+    syntax error, an unknown column or an invalid term.
+    """
+    def compile_node(node: tuple) -> object:
+        match node[0]:
+            case 'and':
+                return fcomp.And([compile_node(n) for n in node[1]])
+            case 'or':
+                return fcomp.Or([compile_node(n) for n in node[1]])
+            case 'not':
+                return fcomp.Not(compile_node(node[1]))
+
+        _, column, criterion = node
+        if column != '' and column not in data.columns:
+            raise ValueError(f'unknown column: {column}')
+        expr, err = make_filter(data, [(column, criterion)])
+        if err:
+            raise ValueError(f'{column}{criterion}: {filter_errors[err]}')
+        return expr.children[0]
+
+    expr = compile_node(parse_filter(text))
+    if not isinstance(expr, fcomp.And):
+        expr = fcomp.And([expr])
+
+    return expr
+
+
+def filter_sets_stats(data: pd.DataFrame,
+                      filter_sets: list,
+                      indexes: object = None) -> pd.DataFrame:
+    """Statistics of the data selected by each filter set.
+
+    Each filter set is a list of (column, criterion) pairs, or a filter
+    expression (make_filter_expression). Returns the stats blocks of all
+    sets in one DataFrame, indexed by (filter, stat); the filter label is
+    its display form and number of records.
+    Raises ValueError for a filter set with an invalid term.
+    """
+    exprs = []
+    for criteria in filter_sets:
+        if isinstance(criteria, str):
+            exprs.append(make_filter_expression(data, criteria))
+            continue
+        for column, _ in criteria:
+            if column not in data.columns:
+                raise ValueError(f'unknown column: {column}')
+        expr, err = make_filter(data, criteria)
+        if err:
+            raise ValueError(f'{criteria}: {filter_errors[err]}')
+        exprs.append(expr)
+
+    # a term shared by several sets (e.g. gender=M) is evaluated once
+    cache = fcomp.MaskCache(maxsize=sum(len(fcomp.terms(e)) for e in exprs) + 1)
+    masks = np.empty((len(exprs), len(data)), dtype=bool)
+    for i, expr in enumerate(exprs):
+        masks[i] = expr.mask(data, cache, indexes)
+
+    blocks = masked_stats(data, stats_columns(data), masks, stat_list)
+    counts = np.count_nonzero(masks, axis=1)
+    labels = [f'{str(e).replace("==", "=")} (n = {n})' for e, n in zip(exprs, counts)]
+
+    return pd.concat(blocks, keys=labels, names=['filter', 'stat'])
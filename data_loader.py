@@ -0,0 +1,297 @@
+"""
+program: data_loader.py
+
+purpose: read a csv file in chunks on a background thread, with progress
+         reporting and cancellation. Keep a columnar (Feather) copy of the
+         loaded dataset, for fast startup.
+
+comments: The first rows are read synchronously by first_chunk(), so the
+          application can build its UI and be used right away. start() then
+          reads the remaining chunks on a daemon thread.
+
+          The thread never touches tkinter: it puts messages on a queue, and
+          the application reads them with messages() from a root.after()
+          callback. Each message is a tuple (kind, payload, fraction), where
+          kind is one of:
+              'chunk'      payload is the DataFrame that was read
+              'done'       all rows have been read
+              'cancelled'  cancel() was called
+              'error'      payload is the exception
+
+          Column dtypes are fixed from a small sample, so every chunk is
+          parsed the same way. Integer columns are left to inference, since
+          a missing value in a later chunk would make an explicit int64
+          dtype fail (concatenation upcasts such a column to float64).
+
+          DatasetCache stores the dataset after column cleaning and dtype
+          conversion as an uncompressed Feather (Arrow IPC) file, keyed by
+          the path, modification time and size of the source csv. Later
+          launches memory-map that file instead of parsing the csv.
+          The cache needs pyarrow; without it, read() always misses and
+          write() does nothing.
+
+          In Arrow mode, read(arrow=True) keeps the columns in the memory
+          mapped Arrow buffers (pandas ArrowDtype), rather than copying them
+          to numpy arrays, and write_csv() converts a csv to the cache file
+          one record batch at a time. Neither needs the dataset to fit in
+          memory. write_csv() stores the csv as it is, with the original
+          column names: a cache made with raw=True keeps it in a file of
+          its own (.arrow), so it is never read as the cleaned dataset.
+          As for CsvLoader, column types are fixed from a sample of the csv
+          (arrow_column_types), rather than from its first block; integer
+          columns are stored as float64, as a later block may hold a
+          fraction.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Add DatasetCache.
+10-18-2026  Add Arrow mode: read(arrow=True) and write_csv().
+10-18-2026  Keep the csv converted by write_csv() apart from the cleaned
+            dataset (raw=True).
+10-18-2026  write_csv(): column types from a sample; remove the temporary
+            file when the conversion fails.
+"""
+
+import glob
+import hashlib
+import os
+import queue
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+
+class CsvLoader:
+    """Chunked csv reader that runs on a background thread."""
+
+    def __init__(self, path: str,
+                 usecols: list | None = None,
+                 dtype: dict | None = None,
+                 first_rows: int = 50_000,
+                 chunksize: int = 200_000):
+        self.path = path
+        self.usecols = usecols
+        self.dtype = dtype
+        self.first_rows = first_rows
+        self.chunksize = chunksize
+
+        self.size = os.path.getsize(path)
+        self.file = None
+        self.reader = None
+        self.chunks = []
+        self.queue = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = None
+
+    def sample_dtypes(self, nrows: int = 1000) -> dict:
+        """Infer float and string column dtypes from the first rows."""
+        sample = pd.read_csv(self.path, nrows=nrows, usecols=self.usecols)
+        dtype = {}
+        for c in sample.columns:
+            if sample[c].dtype == 'float64':
+                dtype[c] = 'float64'
+            elif sample[c].dtype == 'object':
+                dtype[c] = 'object'
+
+        return dtype
+
+    def first_chunk(self) -> pd.DataFrame:
+        """Read the first rows, without a thread.
+
+        Returns a copy: the caller may rename or convert its columns, while
+        the loader keeps the original for concatenation with later chunks.
+        """
+        if self.dtype is None:
+            self.dtype = self.sample_dtypes()
+
+        self.file = open(self.path, 'rb')
+        self.reader = pd.read_csv(self.file,
+                                  usecols=self.usecols,
+                                  dtype=self.dtype,
+                                  iterator=True)
+        try:
+            chunk = self.reader.get_chunk(self.first_rows)
+        except StopIteration:
+            # empty file (header only): no rows
+            chunk = pd.read_csv(self.path, nrows=0, usecols=self.usecols)
+        self.chunks.append(chunk)
+
+        return chunk.copy()
+
+    def start(self) -> None:
+        """Read the rest of the file on a background thread."""
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def cancel(self) -> None:
+        """Stop reading after the current chunk."""
+        self.cancelled.set()
+
+    def progress(self) -> float:
+        """Fraction of the file read so far."""
+        if self.size == 0 or self.file.closed:
+            return 1.0
+
+        return min(1.0, self.file.tell() / self.size)
+
+    def messages(self) -> list:
+        """Return the messages posted by the thread since the last call."""
+        msgs = []
+        while True:
+            try:
+                msgs.append(self.queue.get_nowait())
+            except queue.Empty:
+                return msgs
+
+    def data(self) -> pd.DataFrame:
+        """All rows read so far, as one DataFrame."""
+        return pd.concat(self.chunks, ignore_index=True)
+
+    def _run(self) -> None:
+        try:
+            while not self.cancelled.is_set():
+                try:
+                    chunk = self.reader.get_chunk(self.chunksize)
+                except StopIteration:
+                    break
+                self.chunks.append(chunk)
+                self.queue.put(('chunk', chunk, self.progress()))
+
+            if self.cancelled.is_set():
+                self.queue.put(('cancelled', None, self.progress()))
+            else:
+                self.queue.put(('done', None, 1.0))
+        except Exception as exc:
+            self.queue.put(('error', exc, self.progress()))
+        finally:
+            self.reader.close()
+            self.file.close()
+
+
+class DatasetCache:
+    """Feather copy of a dataset, valid while the source file is unchanged."""
+
+    def __init__(self, source: str, cache_dir: str | None = None, raw: bool = False):
+        self.source = os.path.abspath(source)
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(self.source), '.cache')
+        self.cache_dir = cache_dir
+        self.name = os.path.basename(self.source)
+        # the csv as it is (write_csv), or the cleaned dataset (write)
+        self.suffix = 'arrow' if raw else 'feather'
+
+    def path(self) -> str:
+        """Cache file for the current version of the source."""
+        st = os.stat(self.source)
+        key = f'{self.source}|{st.st_mtime_ns}|{st.st_size}'
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+
+        return os.path.join(self.cache_dir, f'{self.name}.{digest}.{self.suffix}')
+
+    def read(self, arrow: bool = False) -> pd.DataFrame | None:
+        """Return the cached dataset, or None if there is no valid copy.
+
+        With arrow=True, columns are ArrowDtype views of the memory-mapped
+        file. Dictionary (categorical) columns still become Categorical.
+        """
+        if feather is None:
+            return None
+
+        path = self.path()
+        if not os.path.exists(path):
+            return None
+
+        if arrow:
+            types_mapper = arrow_types
+        else:
+            types_mapper = None
+
+        try:
+            table = feather.read_table(path, memory_map=True)
+            return table.to_pandas(types_mapper=types_mapper)
+        except OSError:
+            # unreadable (e.g. truncated) cache file: parse the csv instead
+            return None
+
+    def write(self, data: pd.DataFrame, wait: bool = False) -> None:
+        """Save the dataset, on a background thread unless wait is True."""
+        if feather is None:
+            return
+
+        if wait:
+            self._write(data)
+        else:
+            threading.Thread(target=self._write, args=(data,), daemon=True).start()
+
+    def write_csv(self) -> None:
+        """Convert the source csv to the cache file, one batch at a time."""
+        if feather is None:
+            return
+
+        path = self.path()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        tmp = path + '.tmp'
+        # empty fields are missing values, as in read_csv()
+        options = pa_csv.ConvertOptions(column_types=arrow_column_types(self.source),
+                                        strings_can_be_null=True)
+        try:
+            reader = pa_csv.open_csv(self.source, convert_options=options)
+            with pa.ipc.new_file(tmp, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+            self._replace(tmp, path)
+        finally:
+            # a failed conversion leaves no partial file
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _write(self, data: pd.DataFrame) -> None:
+        path = self.path()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # write to a temporary name, so an interrupted write is never read
+        tmp = path + '.tmp'
+        feather.write_feather(data, tmp, compression='uncompressed')
+        self._replace(tmp, path)
+
+    def _replace(self, tmp: str, path: str) -> None:
+        os.replace(tmp, path)
+
+        # remove copies of older versions of the source
+        pattern = f'{glob.escape(self.name)}.*.{self.suffix}'
+        for old in glob.glob(os.path.join(self.cache_dir, pattern)):
+            if old != path:
+                os.remove(old)
+
+
+def arrow_column_types(path: str, nrows: int = 1000) -> dict:
+    """Arrow types of the numeric and string csv columns, from the first rows."""
+    sample = pd.read_csv(path, nrows=nrows)
+    types = {}
+    for c in sample.columns:
+        if (pd.api.types.is_integer_dtype(sample[c].dtype) or
+                pd.api.types.is_float_dtype(sample[c].dtype)):
+            types[c] = pa.float64()
+        elif sample[c].dtype == 'object':
+            types[c] = pa.string()
+
+    return types
+
+
+def arrow_types(arrow_type: object) -> pd.ArrowDtype | None:
+    """types_mapper for Table.to_pandas(): ArrowDtype, except dictionaries."""
+    if pa.types.is_dictionary(arrow_type):
+        return None
+
+    return pd.ArrowDtype(arrow_type)
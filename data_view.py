@@ -0,0 +1,126 @@
+"""
+program: data_view.py
+
+purpose: windowed display of a pandas DataFrame in a tkinter Text widget.
+
+comments: Only the rows that fit in the Text widget are formatted and
+          inserted. The scrollbar is driven by the view rather than by the
+          Text widget, so the scrollbar thumb reflects the position in the
+          complete dataset, not in the few lines that are displayed.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Move the formatting of rows to format_rows(), so it can be
+            timed without a window (benchmark.py).
+10-18-2026  format_rows() moves to row_selection.py, which doesn't import
+            tkinter.
+"""
+
+import tkinter as tk
+import tkinter.font as tkfont
+
+import pandas as pd
+
+from row_selection import format_rows
+
+
+class DataView:
+    """Display the visible page of a DataFrame in a Text widget.
+
+    The header row (line 1) keeps the 'redtext' / 'bluetext' tag that
+    indicates filtered or complete data.
+    """
+
+    def __init__(self, win: tk.Text, scroll: object):
+        self.win = win
+        self.scroll = scroll
+        self.data = None
+        self.header_tag = 'bluetext'
+        self.first_row = 0
+        # minimum column widths seen so far, so columns don't shift as the
+        # user scrolls from short values to long ones
+        self.col_space = {}
+
+        # one Text line per record
+        self.win.configure(wrap='none')
+        self.scroll.configure(command=self.yview)
+
+        self.win.bind('<MouseWheel>', self.on_wheel)
+        self.win.bind('<Button-4>', self.on_wheel)
+        self.win.bind('<Button-5>', self.on_wheel)
+        self.win.bind('<Prior>', lambda ev: self.yview('scroll', -1, 'pages'))
+        self.win.bind('<Next>', lambda ev: self.yview('scroll', 1, 'pages'))
+        self.win.bind('<Configure>', lambda ev: self.render())
+
+    def show(self, data: pd.DataFrame, header_tag: str) -> None:
+        """Display a new dataset, starting at the first row."""
+        self.data = data
+        self.header_tag = header_tag
+        self.first_row = 0
+        self.col_space = {}
+        self.render()
+
+    def page_rows(self) -> int:
+        """Return the number of data rows that fit in the Text widget."""
+        height = self.win.winfo_height()
+        if height > 1:
+            linespace = tkfont.Font(font=self.win.cget('font')).metrics('linespace')
+            lines = height // linespace
+        else:
+            # not yet mapped: use the configured height, in lines
+            lines = int(self.win.cget('height'))
+
+        # one line is used by the header
+        return max(1, lines - 1)
+
+    def max_first_row(self) -> int:
+        return max(0, len(self.data) - self.page_rows())
+
+    def yview(self, *args) -> None:
+        """Scrollbar callback: 'moveto' fraction, or 'scroll' n units|pages."""
+        if self.data is None:
+            return
+
+        nrows = len(self.data)
+        match args:
+            case ('moveto', fraction):
+                self.first_row = int(float(fraction) * nrows)
+            case ('scroll', number, 'pages'):
+                self.first_row += int(number) * self.page_rows()
+            case ('scroll', number, _):
+                self.first_row += int(number)
+
+        self.first_row = min(max(0, self.first_row), self.max_first_row())
+        self.render()
+
+    def on_wheel(self, ev) -> str:
+        if ev.num == 4 or ev.delta > 0:
+            self.yview('scroll', -3, 'units')
+        else:
+            self.yview('scroll', 3, 'units')
+
+        # don't let the Text class binding scroll the widget contents
+        return 'break'
+
+    def render(self) -> None:
+        """Format and display only the rows in the visible window."""
+        if self.data is None:
+            return
+
+        last_row = self.first_row + self.page_rows()
+        rows = self.data.iloc[self.first_row:last_row]
+
+        self.win.configure(state='normal')
+        self.win.delete('1.0', tk.END)
+        self.win.insert('1.0', format_rows(rows, self.col_space))
+        self.win.tag_add(self.header_tag, '1.0', '1.end')
+        self.win.configure(state='disabled')
+
+        nrows = len(self.data)
+        if nrows == 0:
+            self.scroll.set(0.0, 1.0)
+        else:
+            self.scroll.set(self.first_row / nrows, min(last_row, nrows) / nrows)
@@ -0,0 +1,569 @@
+"""
+program: filter_compile.py
+
+purpose: compile validated filter criteria into a tree of vectorized NumPy
+         comparisons, evaluated directly to a boolean mask.
+
+comments: The leaves of the tree are Term objects (column, op, value). An
+          And node combines its children with a logical and, an Or node
+          with a logical or, and a Not node negates its child. Column names
+          are used as-is, so names containing spaces work, and there is no
+          expression string to parse on each evaluation (as with
+          DataFrame.query).
+
+          str() of a compiled filter gives the familiar display form, e.g.
+          age>55 & gender=="M", or (age>70 | TID>1.1) & !(gender=="U")
+
+          Evaluation is planned (Planner): the children of an And are tested
+          in order of rank, so cheap terms that reject many rows go first,
+          and each child is tested only on the rows that passed the ones
+          before it. The children of an Or are tested on the rows no earlier
+          child has accepted. Selectivity (the fraction of rows that pass
+          a term) is estimated from the column indexes when there are any,
+          else from typical values for each operator; string comparisons
+          cost more than numeric or category ones. Once few rows are left,
+          a term is tested on those rows only; while many are, the whole
+          column is tested, so its mask can be cached.
+
+          MaskCache keeps the masks of recently used terms, so a filter in
+          which only one row has changed recomputes only that term. A term
+          is looked up in the cache first; a mask that is computed for the
+          whole column is stored, whether it comes from a column index or
+          from a scan.
+
+          With column indexes (column_index.py), the mask of a term is made
+          from the rows its index gives, without comparing any value.
+          Without a cache, an And node starts from the rows of its most
+          selective indexed term and tests the remaining terms on those
+          rows only (positions).
+
+          An evaluation can be cancelled from another thread: cancelled(),
+          given to And.mask() or refine_positions(), is checked before each
+          child of a node is tested, and Cancelled is raised if it is true.
+
+          A filter that only narrows the previous one (e.g. age>55 changed
+          to age>60, or a term added) refines() it: its rows are found by
+          testing the new terms on the previous rows only
+          (refine_positions), instead of on the whole dataset. A term
+          implies() another when every value that passes it passes the
+          other.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Add MaskCache: LRU cache of term masks.
+10-18-2026  Answer And filters from sorted column indexes, when available.
+10-18-2026  Compare Categorical columns by their codes.
+10-18-2026  Compare Arrow-backed columns with Arrow kernels, without a copy.
+10-18-2026  Add Term.implies(), And.refines() and And.refine_positions(), for
+            incremental filtering.
+10-18-2026  Add Or and Not nodes, and Planner: children are ordered by
+            estimated selectivity and cost, and tested only on the rows
+            still undecided (test_rows).
+10-18-2026  And.mask() and refine_positions() take the estimate of the
+            planner (e.g. column_stats.ColumnStats.selectivity).
+10-18-2026  Use the mask cache with column indexes: term masks from an index
+            are cached, and a cached mask is used before the index.
+10-18-2026  Check cancelled() before each child of every node, not only
+            between the new terms of refine_positions().
+10-18-2026  Term.test(): missing values of an object column are only != a
+            value, as with query(), instead of failing range comparisons.
+"""
+
+import operator
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+OPS = {'==': operator.eq,
+       '!=': operator.ne,
+       '<': operator.lt,
+       '<=': operator.le,
+       '>': operator.gt,
+       '>=': operator.ge}
+
+
+dense_fraction = 0.25    # test a whole column if more of its rows are undecided
+
+
+class Cancelled(Exception):
+    """Raised when an evaluation is cancelled (see Planner.check)."""
+
+
+class Term:
+    """Leaf node: compare one column to a value."""
+
+    def __init__(self, column: str, op: str, value: object):
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def __str__(self):
+        if isinstance(self.value, str):
+            return f'{self.column}{self.op}"{self.value}"'
+        return f'{self.column}{self.op}{self.value}'
+
+    def key(self) -> tuple:
+        return (self.column, self.op, self.value)
+
+    def columns(self) -> list:
+        return [self.column]
+
+    def implies(self, other: object) -> bool:
+        """True if every value that passes this term passes other."""
+        if self.key() == other.key():
+            return True
+        if isinstance(other, Or):
+            return any(self.implies(c) for c in other.children)
+        if not isinstance(other, Term) or self.column != other.column:
+            return False
+
+        a, b = self.value, other.value
+        if isinstance(a, str) or isinstance(b, str):
+            # strings: only equality is known to imply anything
+            return self.op == '==' and OPS[other.op](a, b)
+
+        match self.op, other.op:
+            case '==', _:
+                return bool(OPS[other.op](a, b))
+            case ('>', '>') | ('>', '>=') | ('>=', '>='):
+                return a >= b
+            case '>=', '>':
+                return a > b
+            case ('<', '<') | ('<', '<=') | ('<=', '<='):
+                return a <= b
+            case '<=', '<':
+                return a < b
+
+        return False
+
+    def values(self, data: pd.DataFrame) -> np.ndarray | pd.api.extensions.ExtensionArray:
+        """The column as an array, without converting a Categorical or Arrow array."""
+        col = data[self.column]
+        if isinstance(col.dtype, (pd.CategoricalDtype, pd.ArrowDtype)):
+            return col.array
+
+        return col.to_numpy()
+
+    def test(self, values: np.ndarray | pd.Categorical) -> np.ndarray:
+        # for a Categorical, compare each category once, then look up the
+        # result by code. Missing values (code -1) are only != a value.
+        if isinstance(values, pd.Categorical):
+            per_category = OPS[self.op](values.categories.to_numpy(), self.value)
+            per_code = np.append(np.asarray(per_category, dtype=bool), self.op == '!=')
+            return per_code[values.codes]
+
+        # Arrow comparisons give null for missing values: like NaN, those
+        # are only != a value
+        if isinstance(values.dtype, pd.ArrowDtype):
+            result = OPS[self.op](values, self.value)
+            return result.to_numpy(dtype=bool, na_value=self.op == '!=')
+
+        # an object (string) column holds NaN or None for missing values,
+        # which can't be ordered against a string: compare the others only
+        if values.dtype == object:
+            missing = pd.isna(values)
+            if missing.any():
+                result = np.full(len(values), self.op == '!=')
+                result[~missing] = OPS[self.op](values[~missing], self.value)
+                return result
+
+        return np.asarray(OPS[self.op](values, self.value), dtype=bool)
+
+    def mask(self, data: pd.DataFrame,
+             cache: 'MaskCache | None' = None,
+             indexes: object = None) -> np.ndarray:
+        """The mask of the whole column: from the cache, the index or a scan."""
+        if cache is not None:
+            return cache.mask(self, data, indexes)
+
+        if indexes is not None and indexes.data is data:
+            rows = indexes.positions(self.column, self.op, self.value)
+            if rows is not None:
+                result = np.zeros(len(data), dtype=bool)
+                result[rows] = True
+                return result
+
+        return self.test(self.values(data))
+
+    def test_rows(self, data: pd.DataFrame,
+                  rows: np.ndarray | None,
+                  cache: 'MaskCache | None' = None,
+                  planner: 'Planner | None' = None) -> np.ndarray:
+        """Test rows (positions; None for all): a boolean array, one per row.
+
+        The mask of the whole column is used if it is cached, or if most
+        rows are to be tested (and it is then cached).
+        """
+        indexes = planner.indexes if planner is not None else None
+        if rows is None:
+            return self.mask(data, cache, indexes)
+        if ((cache is not None and cache.contains(self, data)) or
+                len(rows) > dense_fraction * len(data)):
+            return self.mask(data, cache, indexes)[rows]
+
+        return self.test(self.values(data)[rows])
+
+
+class Not:
+    """Node: the child must be false."""
+
+    def __init__(self, child: object):
+        self.child = child
+
+    def __str__(self):
+        if isinstance(self.child, Or):
+            return f'!{self.child}'
+        return f'!({self.child})'
+
+    def key(self) -> tuple:
+        return ('not', self.child.key())
+
+    def columns(self) -> list:
+        return self.child.columns()
+
+    def implies(self, other: object) -> bool:
+        return self.key() == other.key()
+
+    def mask(self, data: pd.DataFrame, cache: 'MaskCache | None' = None) -> np.ndarray:
+        return self.test_rows(data, None, cache)
+
+    def test_rows(self, data: pd.DataFrame,
+                  rows: np.ndarray | None,
+                  cache: 'MaskCache | None' = None,
+                  planner: 'Planner | None' = None) -> np.ndarray:
+        return ~self.child.test_rows(data, rows, cache, planner)
+
+
+class Or:
+    """Node: at least one child must be true."""
+
+    def __init__(self, children: list):
+        self.children = children
+
+    def __str__(self):
+        return '(' + ' | '.join(str(c) for c in self.children) + ')'
+
+    def key(self) -> tuple:
+        return ('or',) + tuple(c.key() for c in self.children)
+
+    def columns(self) -> list:
+        return list(dict.fromkeys(col for c in self.children for col in c.columns()))
+
+    def implies(self, other: object) -> bool:
+        # every alternative must imply other
+        return (self.key() == other.key() or
+                all(c.implies(other) for c in self.children))
+
+    def mask(self, data: pd.DataFrame, cache: 'MaskCache | None' = None) -> np.ndarray:
+        return self.test_rows(data, None, cache)
+
+    def test_rows(self, data: pd.DataFrame,
+                  rows: np.ndarray | None,
+                  cache: 'MaskCache | None' = None,
+                  planner: 'Planner | None' = None) -> np.ndarray:
+        """Each child is tested only on the rows that no child before it accepted."""
+        if planner is None:
+            planner = Planner(data)
+
+        result = np.zeros(len(data) if rows is None else len(rows), dtype=bool)
+        undecided = None      # positions in rows (or data) not yet accepted
+        for c in planner.order_or(self.children):
+            planner.check()
+            if undecided is None:
+                passed = c.test_rows(data, rows, cache, planner)
+                result |= passed
+                undecided = np.flatnonzero(~passed)
+            else:
+                subset = undecided if rows is None else rows[undecided]
+                passed = c.test_rows(data, subset, cache, planner)
+                result[undecided[passed]] = True
+                undecided = undecided[~passed]
+            if len(undecided) == 0:
+                break
+
+        return result
+
+
+class And:
+    """Node: all children must be true."""
+
+    def __init__(self, children: list):
+        self.children = children
+
+    def __str__(self):
+        return ' & '.join(str(c) for c in self.children)
+
+    def key(self) -> tuple:
+        return ('and',) + tuple(c.key() for c in self.children)
+
+    def columns(self) -> list:
+        return list(dict.fromkeys(col for c in self.children for col in c.columns()))
+
+    def implies(self, other: object) -> bool:
+        return (self.key() == other.key() or
+                any(c.implies(other) for c in self.children))
+
+    def mask(self, data: pd.DataFrame,
+             cache: 'MaskCache | None' = None,
+             indexes: object = None,
+             estimate: callable = None,
+             cancelled: callable = None) -> np.ndarray:
+        """The mask of the filter. If cancelled() becomes true, Cancelled is raised."""
+        planner = Planner(data, indexes, estimate, cancelled)
+        if cache is None and planner.indexes is not None:
+            rows = self.positions(data, indexes, planner)
+            if rows is not None:
+                result = np.zeros(len(data), dtype=bool)
+                result[rows] = True
+                return result
+
+        return self.test_rows(data, None, cache, planner)
+
+    def test_rows(self, data: pd.DataFrame,
+                  rows: np.ndarray | None,
+                  cache: 'MaskCache | None' = None,
+                  planner: 'Planner | None' = None) -> np.ndarray:
+        """Each child is tested only on the rows that passed the children before it."""
+        if planner is None:
+            planner = Planner(data)
+
+        alive = None      # positions in rows (or data) that passed so far
+        for c in planner.order_and(self.children):
+            planner.check()
+            if alive is None:
+                alive = np.flatnonzero(c.test_rows(data, rows, cache, planner))
+            else:
+                subset = alive if rows is None else rows[alive]
+                alive = alive[c.test_rows(data, subset, cache, planner)]
+            if len(alive) == 0:
+                break
+
+        result = np.zeros(len(data) if rows is None else len(rows), dtype=bool)
+        if alive is None:
+            result[:] = True
+        else:
+            result[alive] = True
+
+        return result
+
+    def refines(self, previous: 'And') -> bool:
+        """True if this filter selects a subset of the rows of previous:
+        each term of previous is implied by a term of this filter.
+        """
+        return all(any(c.implies(p) for c in self.children)
+                   for p in previous.children)
+
+    def refine_positions(self, data: pd.DataFrame,
+                         previous: 'And',
+                         rows: np.ndarray,
+                         cancelled: callable = None,
+                         estimate: callable = None,
+                         cache: 'MaskCache | None' = None) -> np.ndarray:
+        """Row positions of this filter, from the rows of a filter it refines.
+
+        Only the terms that are not in previous are tested, and only on
+        rows. cancelled() is checked before each term; if it is true,
+        Cancelled is raised. estimate is that of Planner. A term whose
+        mask is in cache is read from it.
+        """
+        planner = Planner(data, estimate=estimate, cancelled=cancelled)
+        done = {p.key() for p in previous.children}
+        for c in planner.order_and(self.children):
+            if c.key() in done:
+                continue
+            planner.check()
+            rows = rows[c.test_rows(data, rows, cache, planner)]
+
+        return rows
+
+    def positions(self, data: pd.DataFrame,
+                  indexes: object,
+                  planner: 'Planner | None' = None) -> np.ndarray | None:
+        """Row positions satisfying all children, or None if no term is indexed.
+
+        Starts from the smallest indexed result, then keeps the rows that
+        pass each of the other children.
+        """
+        if planner is None:
+            planner = Planner(data, indexes)
+
+        indexed = []
+        for c in self.children:
+            if isinstance(c, Term):
+                rows = indexes.positions(c.column, c.op, c.value)
+                if rows is not None:
+                    indexed.append((len(rows), rows, c))
+
+        if not indexed:
+            return None
+
+        _, rows, first = min(indexed, key=lambda item: item[0])
+        for c in planner.order_and(self.children):
+            if c is not first:
+                planner.check()
+                rows = rows[c.test_rows(data, rows, None, planner)]
+
+        return rows
+
+
+class Planner:
+    """Estimates of selectivity and cost, to order the children of a node.
+
+    Selectivity is the estimated fraction of rows that pass. It comes from
+    estimate(term), if given; else from the column indexes; else from
+    typical values for the operator. Cost is relative: a string comparison
+    is costlier than a numeric or category one.
+
+    The nodes check() the planner before testing each child, so that the
+    evaluation stops when cancelled() becomes true.
+    """
+
+    # typical fraction of rows that pass, when nothing is known
+    default_selectivity = {'==': 0.1, '!=': 0.9,
+                           '<': 1 / 3, '<=': 1 / 3, '>': 1 / 3, '>=': 1 / 3}
+    string_cost = 8.0
+
+    def __init__(self, data: pd.DataFrame,
+                 indexes: object = None,
+                 estimate: callable = None,
+                 cancelled: callable = None):
+        self.data = data
+        self.indexes = indexes if indexes is not None and indexes.data is data else None
+        self.estimate = estimate
+        self.cancelled = cancelled
+        self.known = {}
+
+    def check(self) -> None:
+        """Raise Cancelled if the evaluation has been cancelled."""
+        if self.cancelled is not None and self.cancelled():
+            raise Cancelled()
+
+    def selectivity(self, node: object) -> float:
+        if isinstance(node, Term):
+            key = node.key()
+            if key not in self.known:
+                self.known[key] = self.term_selectivity(node)
+            return self.known[key]
+        if isinstance(node, Not):
+            return 1.0 - self.selectivity(node.child)
+
+        fractions = [self.selectivity(c) for c in node.children]
+        if isinstance(node, Or):
+            return 1.0 - float(np.prod([1.0 - f for f in fractions]))
+
+        return float(np.prod(fractions))
+
+    def term_selectivity(self, term: Term) -> float:
+        if self.estimate is not None:
+            fraction = self.estimate(term)
+            if fraction is not None:
+                return fraction
+
+        if self.indexes is not None and len(self.data) > 0:
+            count = self.indexes.count(term.column, term.op, term.value)
+            if count is not None:
+                return count / len(self.data)
+
+        return self.default_selectivity.get(term.op, 0.5)
+
+    def cost(self, node: object) -> float:
+        if isinstance(node, Term):
+            dtype = self.data[node.column].dtype
+            if dtype == object or pd.api.types.is_string_dtype(dtype):
+                if not isinstance(dtype, (pd.CategoricalDtype, pd.ArrowDtype)):
+                    return self.string_cost
+            return 1.0
+        if isinstance(node, Not):
+            return self.cost(node.child)
+
+        return sum(self.cost(c) for c in node.children)
+
+    def order_and(self, children: list) -> list:
+        """Cheapest per row rejected first."""
+        return sorted(children,
+                      key=lambda c: self.cost(c) / max(1.0 - self.selectivity(c), 1e-6))
+
+    def order_or(self, children: list) -> list:
+        """Cheapest per row accepted first."""
+        return sorted(children,
+                      key=lambda c: self.cost(c) / max(self.selectivity(c), 1e-6))
+
+
+class MaskCache:
+    """Size-bounded LRU cache of term masks for one DataFrame.
+
+    Entries are keyed by (column, op, value). The cache belongs to a single
+    DataFrame object: a mask requested for a different object clears it.
+    """
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self.data = None
+        self.masks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def contains(self, term: Term, data: pd.DataFrame) -> bool:
+        return data is self.data and term.key() in self.masks
+
+    def mask(self, term: Term, data: pd.DataFrame, indexes: object = None) -> np.ndarray:
+        """The cached mask of term, or its mask from the index or a scan, cached."""
+        if data is not self.data:
+            self.clear()
+            self.data = data
+
+        key = term.key()
+        if key in self.masks:
+            self.hits += 1
+            self.masks.move_to_end(key)
+            return self.masks[key]
+
+        self.misses += 1
+        result = term.mask(data, None, indexes)
+        # shared between filters: must not be changed in place
+        result.flags.writeable = False
+        self.masks[key] = result
+        if len(self.masks) > self.maxsize:
+            self.masks.popitem(last=False)
+
+        return result
+
+    def clear(self) -> None:
+        self.data = None
+        self.masks.clear()
+
+    def cache_info(self) -> dict:
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'maxsize': self.maxsize,
+                'currsize': len(self.masks)}
+
+
+def compile_term(column: str, criterion: dict, quote: str) -> Term:
+    """Make a Term from the output of set_criterion() and check_filter_data().
+
+    An empty quote means the value was validated as numeric.
+    """
+    value = criterion['value']
+    if quote == '':
+        value = float(value) if '.' in value else int(value)
+
+    return Term(column, criterion['op'], value)
+
+
+def terms(expr: object) -> list:
+    """The Term leaves of a filter tree."""
+    if isinstance(expr, Term):
+        return [expr]
+    if isinstance(expr, Not):
+        return terms(expr.child)
+
+    return [t for c in expr.children for t in terms(c)]
+
+
+def compile_filter(terms: list) -> And:
+    return And(terms)
@@ -0,0 +1,208 @@
+"""
+program: instrument.py
+
+purpose: timing of the application's functions: wall time, rows in and
+         out, and memory allocated, kept in a ring buffer for display and
+         export.
+
+comments: A function is instrumented with the decorator:
+
+              @instrument.timed()
+              def data_filter(data, windows): ...
+
+          or a block of code with the context manager:
+
+              with instrument.span('render') as s:
+                  ...
+                  s.rows_out = len(rows)
+
+          Each call adds an Event to `events`, a deque of the last
+          buffer_size events. Rows in is the length of the first argument
+          that is a DataFrame, Series, array or RowSelection; rows out is
+          the length of the return value (or of its 'data' or 'x' item, for
+          the dicts returned by worker tasks). Bytes is the change in memory
+          traced by tracemalloc over the call, when trace_memory is set
+          (tracing slows allocation, so it is optional).
+
+          Instrumentation is decided when a function is decorated: unless
+          enable() was called before, timed() returns the function itself,
+          so disabled instrumentation costs nothing. span() returns a shared
+          do-nothing context when disabled.
+
+          chrome_trace() gives the events in the Chrome trace event format
+          (complete 'X' events, one row per thread), which can be opened in
+          chrome://tracing or ui.perfetto.dev.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass
+
+enabled = False          # set by enable(), before functions are decorated
+trace_memory = False     # bytes allocated, from tracemalloc
+buffer_size = 2_000      # events kept
+
+events = deque(maxlen=buffer_size)
+
+
+@dataclass
+class Event:
+    name: str
+    start: float         # perf_counter seconds
+    seconds: float
+    thread: str
+    rows_in: int | None = None
+    rows_out: int | None = None
+    bytes: int | None = None
+
+
+def enable(on: bool = True,
+           memory: bool = False,
+           size: int | None = None) -> None:
+    """Turn instrumentation on (before the functions to time are defined)."""
+    global enabled, trace_memory, events
+
+    enabled = on
+    trace_memory = on and memory
+    if size is not None:
+        events = deque(events, maxlen=size)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def rows(obj: object) -> int | None:
+    """Number of rows of a data object, or None if it is not one."""
+    if isinstance(obj, dict):
+        # results of worker tasks: the data, or the points of a plot
+        return rows(obj['data'] if 'data' in obj else obj.get('x'))
+    if hasattr(obj, 'shape') or hasattr(obj, 'rows'):
+        try:
+            return len(obj)
+        except TypeError:
+            return None
+
+    return None
+
+
+class span:
+    """Context manager: record one event for the block it encloses.
+
+    rows_in and rows_out may be set on it inside the block.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        if not enabled:
+            return _null_span
+        return super().__new__(cls)
+
+    def __init__(self, name: str, rows_in: int | None = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def __enter__(self) -> 'span':
+        self.memory = tracemalloc.get_traced_memory()[0] if trace_memory else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        end = time.perf_counter()
+        allocated = None
+        if self.memory is not None:
+            allocated = tracemalloc.get_traced_memory()[0] - self.memory
+        events.append(Event(self.name, self.start, end - self.start,
+                            threading.current_thread().name,
+                            self.rows_in, self.rows_out, allocated))
+
+
+class _NullSpan:
+    """span() when disabled: records nothing, ignores rows_in/rows_out."""
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def __setattr__(self, name: str, value: object) -> None:
+        pass
+
+
+_null_span = _NullSpan()
+
+
+def timed(name: str | None = None) -> callable:
+    """Decorator: record an event for each call of the function."""
+
+    def decorate(fn: callable) -> callable:
+        if not enabled:
+            return fn
+
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            rows_in = next((n for n in map(rows, args) if n is not None), None)
+            with span(label, rows_in) as s:
+                result = fn(*args, **kwargs)
+                s.rows_out = rows(result)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def clear() -> None:
+    events.clear()
+
+
+def summary() -> list:
+    """Per function: (name, calls, total seconds, mean, max, rows in, rows out)
+    of the buffered events, slowest total first; rows are from the last call.
+    """
+    names = {}
+    for e in list(events):
+        calls, total, longest, _, _ = names.get(e.name, (0, 0.0, 0.0, None, None))
+        names[e.name] = (calls + 1, total + e.seconds, max(longest, e.seconds),
+                         e.rows_in, e.rows_out)
+
+    table = [(name, calls, total, total / calls, longest, rows_in, rows_out)
+             for name, (calls, total, longest, rows_in, rows_out) in names.items()]
+
+    return sorted(table, key=lambda t: t[2], reverse=True)
+
+
+def chrome_trace() -> dict:
+    """The buffered events in the Chrome trace event format."""
+    threads = {}
+    trace = []
+    for e in list(events):
+        tid = threads.setdefault(e.thread, len(threads) + 1)
+        args = {k: v for k, v in [('rows_in', e.rows_in),
+                                  ('rows_out', e.rows_out),
+                                  ('bytes', e.bytes)] if v is not None}
+        trace.append({'name': e.name, 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                      'ts': e.start * 1e6, 'dur': e.seconds * 1e6, 'args': args})
+
+    for thread, tid in threads.items():
+        trace.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                      'args': {'name': thread}})
+
+    return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+
+def export_chrome_trace(path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(chrome_trace(), f)
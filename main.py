@@ -38,6 +38,113 @@ history:
 06-24-2025  Update error messages for erroneous filters.
 08-01-2025  Update grid for some buttons: tool_classes.py expects row-first.
             In scatter create_plot(), better handling of no category.
+10-18-2026  Display data through DataView, which formats only the visible
+            rows instead of inserting the whole DataFrame.
+            Compute statistics with StatsEngine, which updates from the rows
+            that enter or leave the filter.
+            make_filter() returns a compiled filter (filter_compile.py);
+            apply_filter() evaluates it to a boolean mask, without query().
+            Cache term masks in an LRU (mask_cache), so an edit to one
+            filter row recomputes only that term.
+            Build sorted indexes of the numeric columns on load, so range
+            filters are answered by binary search (column_index.py).
+            Store low-cardinality string columns as Categorical, indexed
+            by category, and compare them by their integer codes.
+            Read the csv with CsvLoader: the first rows at startup, the rest
+            in chunks on a background thread, with progress on the status
+            bar and a cancel button. Buttons read data_1 and data_current
+            when clicked, since the dataset is replaced when loading ends.
+            Keep a Feather copy of the loaded dataset (DatasetCache); later
+            launches read it instead of the csv.
+            Add Arrow mode (use_arrow_mode): the dataset is the memory-mapped
+            cache file, and a filter gives a RowSelection (row positions)
+            instead of a new DataFrame. Plots copy only the columns they use.
+            Run filtering, statistics, dataset rebuilds and plot data
+            preparation on a worker thread (TaskRunner, worker.py), with a
+            busy indicator on the status bar. A newer request supersedes an
+            older one of the same kind.
+            Scatter plots of more than scatter_max_points records are drawn
+            as a 2D histogram of point density, or from a stratified sample
+            when a category is used (plot_prep.py).
+            Line plots of more than line_max_points records are downsampled
+            with LTTB. Bar plots are aggregated by x (mean, median or count,
+            chosen in the 'agg' combobox); a numeric x with more than
+            bar_max_bars values is binned.
+            Draw plots in a figure embedded in the plotting panel
+            (PlotCanvas, plot_canvas.py) instead of a new window for each
+            plot. Plotting the same columns again updates the existing
+            line or points, and redraws only them (blitting).
+            Live plots (the 'live' checkbutton): when the filter changes, the
+            current plot is redrawn for the new data. Updates are delayed by
+            plot_update_ms, so a series of filter edits gives one redraw.
+            data_unfilter() clears filter_summary, for the plot title.
+            Add the 'filter sets...' window: statistics for several filter
+            sets (one per line) at once, from one pass over the data
+            (data_core.filter_sets_stats).
+            Add the 'group by' selector to the statistics panel: statistics
+            for each value of a category column, from one groupby pass
+            (stats_engine.group_stats), cached per filter and column. With
+            group_stats_processes > 1, groups are divided among a process
+            pool.
+            Run filters through a lazy Plan (plan.py): with use_lazy_plan, a
+            filter result is a RowSelection, as in Arrow mode, so no
+            full-width filtered DataFrame is made; the data display, plots
+            and grouped statistics read only the rows and columns they use.
+            Count records from one column, not with a full count().
+            Prepare scatter plots from arrays: x, y and the category codes,
+            which are computed once per dataset (category_codes). No copy
+            of the data is made, and category columns are not converted;
+            the category list is applied by remapping codes. The status
+            bar reports the memory used by the plot arrays.
+            Replace the function signature listing of do_profile with timing
+            (instrument.py): the filter and plot functions record their wall
+            time, rows in and out and memory allocated, shown in the
+            'diagnostics' window and exported as a Chrome trace. The
+            do_debug prints of the timed functions are removed.
+            Show the window before reading the dataset: only the column
+            names are read at startup; the dataset (or its first rows), its
+            indexes and statistics are prepared on the worker thread once
+            the window has been drawn (start_dataset). stats_dict is set
+            for each dataset, in dataset_ready(). matplotlib is imported,
+            and the figure created, on the first plot (get_plot_canvas).
+            With report_startup, the times to the first window and to the
+            data are printed.
+            Add live filtering (the 'live' checkbutton of the filter panel):
+            edits in the filter rows filter the data again when typing
+            pauses for live_filter_ms. A new filter cancels the one being
+            evaluated (filter_cancel). When the new filter narrows the one
+            displayed (e.g. age>55 changed to age>60), only its new terms
+            are tested, and only on the rows displayed (current_filter).
+            Add the filter expression entry: a filter with or, not and
+            parentheses, e.g. (age>70 | TID>1.1) & !(gender=M), used
+            instead of the filter rows when it is not empty. The lines of
+            the filter sets window may be such expressions.
+            Add column statistics (column_stats.py), computed for each
+            dataset in build_dataset(): the filter planner orders terms by
+            their estimated selectivity, and the 'n ≈' label of the filter
+            panel shows the expected number of records of the filter as it
+            is edited (show_estimate), without reading the data.
+            In Arrow mode, the stats engine keeps no copies of the columns
+            (low_memory), and only the category columns and those of
+            arrow_index_columns are indexed.
+            group_stats_processes applies on Linux only: the process pool
+            forks the application, which is unsafe on macOS, and Windows
+            has no fork.
+            In Arrow mode the cache is a file of its own (DatasetCache with
+            raw=True), as it holds the csv before column cleaning.
+            Bar plot labels are rounded (plot_prep.tick_labels), as x bins
+            are labeled by their exact midpoints.
+            Remove group_stats_processes: the process pool was forked from
+            the running application, with Tk and threads, which is unsafe
+            on any system, and a spawned process would import this module
+            and build the UI. Grouped statistics run on the worker thread.
+            CsvLoader reads the columns of the csv header (usecols). A
+            filter applied while the csv is loading is applied again to the
+            complete dataset, instead of being replaced by all data.
+            Scatter plots without a category list show missing categories
+            in a color of their own. scatter_data() no longer changes
+            dataset_codes on the worker thread: codes it computes are
+            returned, and kept by the main thread.
 """
 """
 TODO:
@@ -49,22 +156,64 @@ TODO:
        is handled.
 """
 
+import time
+# for the startup report: as early as possible
+startup_start = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk
+from tkinter import filedialog
+import os
 from importlib.machinery import SourceFileLoader
+import threading
 
 # only used by the debug flag: to get function name and caller
 import sys
 
 from ttkthemes import ThemedTk
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
+
+from data_view import DataView
+from stats_engine import StatsEngine
+import filter_compile as fcomp
+from column_index import ColumnIndexes
+from column_stats import ColumnStats
+from data_loader import CsvLoader, DatasetCache
+from row_selection import RowSelection
+from worker import TaskRunner
+import plot_prep
+from data_core import (clean_column_names, numeric_type, categorize_columns,
+                       set_criterion, stat_list, filter_errors)
+from data_core import make_filter as make_filter_criteria
+from data_core import make_filter_expression, filter_sets_stats, ResultCache
+from plan import Plan
+import instrument
 
 msel = SourceFileLoader("msel", "../utilities/tool_classes.py").load_module()
 styles_ttk = SourceFileLoader("styles_ttk", "../styles/styles_ttk.py").load_module()
 
 do_debug = False      # print statements for debug
-do_profile = False    # report function signatures
+do_profile = False    # time the filter and plot functions (instrument.py)
+trace_allocations = False  # do_profile: also measure memory allocated (slower)
+use_sorted_index = True   # index numeric columns, for fast range filters
+use_categories = True     # store low-cardinality string columns as Categorical
+use_dataset_cache = True  # keep a columnar copy of the dataset (needs pyarrow)
+use_arrow_mode = False    # memory-map the dataset as Arrow, for very large files
+arrow_index_columns = []  # Arrow mode: numeric columns to index (12 bytes per row each)
+use_lazy_plan = True      # filter results are row positions; columns read when used
+scatter_max_points = 50_000   # larger scatter plots are binned or sampled
+scatter_density = True        # bin large scatter plots (without category)
+report_plot_memory_use = True  # scatter plot: show the memory used by its data
+line_max_points = 2_000       # larger line plots are downsampled (LTTB)
+bar_max_bars = 100            # larger bar plots are aggregated by x
+plot_update_ms = 150          # live plots: redraw when filter edits pause
+live_filter_ms = 300          # live filtering: filter when typing pauses
+report_startup = False        # print the time to the first window and to the data
+
+# functions are timed only if this is set before they are defined
+if do_profile:
+    instrument.enable(memory=trace_allocations)
 
 """ 
 ----------------------------
@@ -116,24 +265,280 @@ def set_status(status_msg):
     status_txt.set(status_msg)
 
 
+def show_busy(busy: bool) -> None:
+    """TaskRunner callback: show the busy indicator while tasks are running."""
+    if busy:
+        busy_bar.pack(side='right', padx=3, pady=3)
+        busy_bar.start(10)
+    else:
+        busy_bar.stop()
+        busy_bar.pack_forget()
+
+
+def report_task_error(exc: Exception) -> None:
+    set_status(f'error: {exc}')
+
+
+def schedule_plot_update() -> None:
+    """The filter changed: redraw the current plot, if it is live.
+
+    A timer is (re)started on each change, so filter edits in quick
+    succession give one redraw, with the latest data.
+    """
+    global plot_update_id
+
+    if not live_plot.get() or last_plot is None:
+        return
+
+    if plot_update_id is not None:
+        root.after_cancel(plot_update_id)
+    plot_update_id = root.after(plot_update_ms, run_plot_update)
+
+
+def run_plot_update() -> None:
+    global plot_update_id
+
+    plot_update_id = None
+    last_plot(data_current)
+
+
+def filter_edited(ev: object) -> None:
+    """Key or selection in any widget: if it is in a filter row, update
+    the estimate, and filter again when the edits pause (live filtering).
+    """
+    global live_filter_id
+
+    if (ev.widget is not expression_ent and
+            not any(ev.widget in row.winfo_children()[:2] for row in rowframe.item_rows)):
+        return
+
+    show_estimate()
+    if not live_filter.get():
+        return
+
+    if live_filter_id is not None:
+        root.after_cancel(live_filter_id)
+    live_filter_id = root.after(live_filter_ms, run_live_filter)
+
+
+def edited_filter() -> fcomp.And | None:
+    """The filter as edited (expression or rows), or None if it is not valid.
+
+    Nothing is reported: the filter may be incomplete while it is typed.
+    """
+    if filter_expression.get().strip() != '':
+        try:
+            return make_filter_expression(data_1, filter_expression.get())
+        except ValueError:
+            return None
+
+    criteria = [(row.winfo_children()[0].get(), row.winfo_children()[1].get())
+                for row in rowframe.item_rows]
+    expr, _ = make_filter_criteria(data_1, criteria)
+    if isinstance(expr, int):
+        return None
+
+    return expr
+
+
+def show_estimate() -> None:
+    """Show the expected number of records of the edited filter.
+
+    The estimate is computed from the column statistics only (column_stats).
+    """
+    if column_stats is None or column_stats.data is not data_1:
+        estimate_lab.configure(text='')
+        return
+
+    expr = edited_filter()
+    if expr is None:
+        estimate_lab.configure(text='n ≈ ?')
+    else:
+        estimate_lab.configure(text=f'n ≈ {column_stats.rows(expr):,.0f}')
+
+
+def run_live_filter() -> None:
+    """Apply the filter rows, if they make a valid filter that has changed.
+
+    While a criterion is incomplete (e.g. '>'), the data on display is kept.
+    """
+    global live_filter_id, filter_summary
+
+    live_filter_id = None
+    if filter_expression.get().strip() != '':
+        expr, err = make_expression_filter(data_1, filter_expression.get()), 0
+        if expr is None:
+            return
+    else:
+        criteria = [(row.winfo_children()[0].get(), row.winfo_children()[1].get())
+                    for row in rowframe.item_rows]
+        expr, err = make_filter_criteria(data_1, criteria)
+        if isinstance(expr, int):
+            report_filter(err)
+            return
+
+    summary = str(expr).replace('==', '=')
+    if summary == filter_summary:
+        return
+
+    filter_summary = summary
+    report_filter(err)
+    apply_filter(data_1, expr, windows)
+
+
+def poll_loader() -> None:
+    """Report progress of the background csv loader; use the data when done."""
+    for kind, payload, fraction in loader.messages():
+        match kind:
+            case 'chunk':
+                set_status(f'loading {os.path.basename(data_file)}: {fraction:.0%}')
+            case 'done' | 'cancelled' | 'error':
+                loader_cancel_btn.pack_forget()
+                nrecords = sum(len(c) for c in loader.chunks)
+                if kind == 'done':
+                    status_msg = ''
+                elif kind == 'cancelled':
+                    status_msg = f'loading cancelled: {nrecords} records loaded.'
+                else:
+                    status_msg = f'loading error: {payload}'
+
+                set_dataset(loader.data,
+                            save_cache=(kind == 'done' and use_dataset_cache),
+                            status_msg=status_msg)
+                return
+
+    root.after(100, poll_loader)
+
+
+def window_shown(ev: object) -> None:
+    """First <Expose> of the window: read the dataset when drawing is done."""
+    global startup_window
+
+    root.unbind('<Expose>')
+    startup_window = time.perf_counter()
+    root.after_idle(start_dataset)
+
+
+def start_dataset() -> None:
+    """Read the dataset, and prepare it, on the worker thread."""
+    set_status(f'reading {os.path.basename(data_file)}...')
+    tasks.submit('load', build_dataset, read_dataset, on_done=first_dataset_ready)
+
+
+def read_dataset() -> pd.DataFrame:
+    """Worker thread: the dataset at startup.
+
+    A cached copy of the dataset is already cleaned and categorized.
+    Otherwise the first rows of the csv are read now; the rest in the
+    background (see first_dataset_ready, poll_loader).
+    """
+    global loader
+
+    data = None
+    if use_arrow_mode:
+        # the memory-mapped cache file is the dataset: convert the csv if needed
+        data = dataset_cache.read(arrow=True)
+        if data is None:
+            dataset_cache.write_csv()
+            data = dataset_cache.read(arrow=True)
+    elif use_dataset_cache:
+        data = dataset_cache.read()
+
+    if data is None:
+        loader = CsvLoader(data_file, usecols=csv_columns)
+        data = loader.first_chunk()
+
+    return data
+
+
+def first_dataset_ready(result: tuple) -> None:
+    """Use the startup dataset; read the rest of the csv, if there is more."""
+    dataset_ready(result, save_cache=False, status_msg='')
+
+    if report_startup:
+        print(f'startup: first window | {(startup_window - startup_start) * 1e6:10.0f} us',
+              file=sys.stderr)
+        print(f'startup: data ready   | {(time.perf_counter() - startup_start) * 1e6:10.0f} us',
+              file=sys.stderr)
+
+    if loader is not None:
+        loader_cancel_btn.pack(side='right', padx=3, pady=3)
+        loader.start()
+        root.after(100, poll_loader)
+
+
 """ 
 --------------------------
 data interaction functions
 --------------------------
 """
-def clean_column_names(df: pd.core.frame.DataFrame) -> pd.core.frame.DataFrame:
-    """Convert single spaces in column names to underscore character."""
+def set_dataset(get_data: callable,
+                save_cache: bool = False,
+                status_msg: str = '') -> None:
+    """Replace the dataset: rebuild its indexes and statistics, and display it.
+
+    get_data() returns the new DataFrame. It is called on the worker thread,
+    with the rest of the rebuild (see build_dataset).
+    """
+    tasks.submit('load', build_dataset, get_data,
+                 on_done=lambda result: dataset_ready(result, save_cache, status_msg))
+
+
+def category_columns(data: pd.DataFrame) -> list:
+    """The Categorical columns of a dataset."""
+    return [c for c in data.columns
+            if isinstance(data[c].dtype, pd.CategoricalDtype)]
+
+
+def build_dataset(get_data: callable) -> tuple:
+    """Worker thread: prepare a dataset, its indexes and statistics."""
+    data = clean_column_names(get_data())
+    if use_categories:
+        data = categorize_columns(data)
 
-    cols0 = df.columns
-    cols1 = cols0.map(lambda x: x.replace(' ', '_') if isinstance(x, str) else x)
-    df.columns = cols1
+    # the columns that have statistics
+    columns = [c for c in data.columns if numeric_type(data[c].dtype)]
 
-    return df
+    indexes = None
+    if use_sorted_index:
+        indexed = columns
+        if use_arrow_mode:
+            # an index holds a copy of its column: only those picked
+            indexed = [c for c in arrow_index_columns if c in columns]
+        indexes = ColumnIndexes(data, indexed + category_columns(data))
+
+    codes = plot_prep.category_codes(data, category_columns(data))
+
+    # in Arrow mode, statistics are read from the memory-mapped columns
+    engine = StatsEngine(data, columns, low_memory=use_arrow_mode)
+
+    return data, indexes, engine, codes, columns, ColumnStats(data, indexes)
+
+
+def dataset_ready(result: tuple, save_cache: bool, status_msg: str) -> None:
+    """Use the dataset prepared by build_dataset()."""
+    global data_1, stats_engine, column_indexes, dataset_codes, stats_dict
+    global column_stats
+
+    data_1, column_indexes, stats_engine, codes, columns, column_stats = result
+    dataset_codes = {'data': data_1, 'codes': codes}
+    stats_dict = {c: stat_list for c in columns}
+    if save_cache:
+        dataset_cache.write(data_1)
+
+    # a filter applied while the dataset was loading applies to all of it
+    if active_filter is None:
+        data_unfilter(data_1, windows)
+    else:
+        apply_filter(data_1, active_filter, windows)
+    show_estimate()
+    set_status(status_msg)
 
 # this fxn should read the number of filter rows, since the filters parameter is not updated...
 # def data_filter(data: pd.core.frame.DataFrame,
 #                 windows: dict,
 #                 filters: list) -> None:
+@instrument.timed()
 def data_filter(data: pd.core.frame.DataFrame,
                 windows: dict) -> None:
     """Manage the construction and implementation of a dataset filter."""
@@ -141,6 +546,14 @@ def data_filter(data: pd.core.frame.DataFrame,
     global filter_summary
 
     print(f'in data_filter:')
+    if filter_expression.get().strip() != '':
+        expr = make_expression_filter(data, filter_expression.get())
+        if expr is not None:
+            filter_summary = str(expr).replace('==', '=')
+            report_filter(0)
+            apply_filter(data, expr, windows)
+        return
+
     # print(f'    {filters=}')
     item_rows = msel.MultiSelectFrame.get_item_rows()
     # print(f'    {item_rows=}')
@@ -149,10 +562,7 @@ def data_filter(data: pd.core.frame.DataFrame,
     expr = make_filter(data, rowframe.item_rows)
     # print(f'{expr=}')
     if expr not in [-1, -2, -3, -4, -5]:
-        nvalue = str(data.count().iloc[0])
-        # do more to the string?
-
-        expr_display = expr.replace('==', '=')
+        expr_display = str(expr).replace('==', '=')
         filter_summary = expr_display
         # apply_filter(data, expr, windows)
         report_filter(expr)
@@ -246,328 +656,435 @@ def make_filter_orig(data: pd.core.frame.DataFrame, filt_rows: list) -> int | st
         return q_expression
 
 
-def make_filter(data: pd.core.frame.DataFrame, filt_rows: list) -> int | str:
-    """Construct a data filter for a pandas DataFrame.
-    module variables
+@instrument.timed()
+def make_filter(data: pd.core.frame.DataFrame, filt_rows: list) -> int | fcomp.And:
+    """Construct a data filter for a pandas DataFrame, from the filter rows.
+
+    Returns a compiled filter (str() gives the expression), or an error code.
     """
-    dcolumn = []
-    criteria = []
-    terms = []
+    criteria = [(row.winfo_children()[0].get(), row.winfo_children()[1].get())
+                for row in filt_rows]
 
-    err = 0  # False == no error
+    q_expression, err = make_filter_criteria(data, criteria)
 
-    q_expression = ''
-    current_term = ''
+    if isinstance(q_expression, int):
+        print(f'make_filter, returning _{err}_')
+    else:
+        print(f'make_filter, returning {q_expression}')
+        # report nonfatal error
+        if err == -2:
+            report_filter(err)
 
-    # this class var needs to be read. Look for this in the step that calls make_filter...
-    # filt_rows = rowframe.
+    return q_expression
 
-    for i in range(len(filt_rows)):
 
-        this_filter = filt_rows[i].winfo_children()[0].get()
-        this_criterion = filt_rows[i].winfo_children()[1].get()
-        valid_criterion = ''
+def make_expression_filter(data: pd.core.frame.DataFrame, text: str) -> fcomp.And | None:
+    """Compile the filter expression entry; if it is invalid, show why and return None."""
+    try:
+        return make_filter_expression(data, text)
+    except ValueError as exc:
+        set_status(f'filter error: {exc}')
+        return None
 
-        if this_filter == '':
-            err = -1
 
-        if this_criterion == '':
-            err += -2
-        else:
-            valid_criterion = set_criterion(this_criterion)
+def report_filter(res):
+    # messages for the error codes of make_filter(), see data_core.py
+    set_status(filter_errors.get(res, 'ok'))
 
-        print(f'{err=}, {valid_criterion=}')
 
-        if err == 0:
-            # quote = ''
-            dcolumn.append(this_filter)
-            criteria.append(this_criterion)
+@instrument.timed()
+def apply_filter(data: pd.core.frame.DataFrame,
+                 expr: fcomp.And,
+                 windows: dict) -> None:
+    """Apply a data filter to a pandas DataFrame.
 
-            crit_number = len(criteria) - 1
+    The compiled filter is a series of terms like: df[col] > 55, so unlike
+    query() it does not require cleaning column names. Keeping the boolean
+    mask lets the stats engine update from the rows that changed.
+    The filter runs on the worker thread (filter_task).
 
-            data_type = data[this_filter].dtype
-            # print(f'data is {data[this_filter]}')
+    A filter still being evaluated is cancelled. The filter on display
+    is passed on, so a narrower filter can start from its rows.
+    """
+    global active_filter
 
-            filter_check = check_filter_data(valid_criterion['value'], data_type)
+    active_filter = expr
+    previous = None
+    if current_filter is not None and current_filter['data'] is data:
+        previous = current_filter
 
-            # if filter_check['err'] == -3:
-            #     quote = '\"'
-            if filter_check['err'] == 0:
-                quote = filter_check['quote']
-                quoted_value = quote + valid_criterion['value'] + quote
-                current_term = dcolumn[crit_number] + valid_criterion['op'] + quoted_value
+    estimate = None
+    if column_stats is not None and column_stats.data is data:
+        estimate = column_stats.selectivity
 
-                terms.append(current_term)
-            else:
-                err = filter_check['err']
+    tasks.submit('filter', filter_task, data, expr, stats_engine, column_indexes,
+                 previous, new_filter_cancel(), estimate,
+                 on_done=lambda result: show_filtered(result, windows))
 
-    if do_debug:
-        print(f'in function: {sys._getframe().f_code.co_name}')
-        print(f'...called by: {sys._getframe().f_back.f_code.co_name}')
-        print(f'filt, crit: {this_filter}, {this_criterion}')
-        print()
-        print(f'column {this_filter} contains type: {data_type}')
-        print(data_type in ['str', 'object', 'int64'])
-        print(f'q_expression string: {repr(q_expression)}')
-        print()
 
-    if err and terms == []:
-        print(f'make_filter, returning _{err}_')
+def new_filter_cancel() -> callable:
+    """Cancel the filter being evaluated; return the test for the next one."""
+    global filter_cancel
 
-        return err
-    else:
-        for t in terms:
-            q_expression += (t + ' & ')
-        q_expression = q_expression[:-3]
-        print(f'make_filter, returning {q_expression}')
-        # report nonfatal error
-        if err == -2:
-            report_filter(err)
+    filter_cancel.set()
+    filter_cancel = threading.Event()
 
-        return q_expression
+    return filter_cancel.is_set
 
 
-def set_criterion(inp: list) -> dict:
-    """Validate user-entered criterion for filtering data."""
-    op = ''
-    value = ''
+@instrument.timed()
+def filter_task(data: pd.core.frame.DataFrame,
+                expr: fcomp.And | None,
+                engine: StatsEngine,
+                indexes: ColumnIndexes | None,
+                previous: dict | None = None,
+                cancelled: callable = None,
+                estimate: callable = None) -> dict:
+    """Worker thread: filter the data (None: no filter), and get its statistics.
 
-    # this definition is not required...
-    criterion = {'op': op,
-                 'value': value}
+    The stats engine and indexes are passed in, rather than read from the
+    module variables, so a task always uses those that belong to data.
 
-    char1 = inp[0]
-    if len(inp) > 1:
-        char2 = inp[1]
+    previous is the filter on display ({'data', 'expr', 'rows'}); if expr
+    narrows it, only the new terms are tested, on its rows. If cancelled()
+    becomes true, fcomp.Cancelled is raised, while the filter is evaluated
+    (before each term) or before the stats engine is changed (the result
+    would be discarded anyway, see worker.py).
+    estimate gives the selectivity of a term, for the filter planner.
+    """
+    rows = None
+    if expr is None:
+        selection = data
+        engine.reset()
     else:
-        char2 = ''
+        if previous is not None and expr.refines(previous['expr']):
+            rows = expr.refine_positions(data, previous['expr'], previous['rows'],
+                                         cancelled, estimate, mask_cache)
+            mask = np.zeros(len(data), dtype=bool)
+            mask[rows] = True
+        else:
+            mask = Plan(data, mask_cache, indexes, estimate, cancelled).filter(expr).mask()
+            rows = np.flatnonzero(mask)
+
+        if cancelled is not None and cancelled():
+            raise fcomp.Cancelled()
 
-    if char1 in ['!', '=', '>', '<']:
-        if char2 == '=':
-            value = inp[2:]
-            op = inp[0:2]
+        if use_arrow_mode or use_lazy_plan:
+            # row positions only: columns are read when displayed or plotted
+            selection = RowSelection(data, mask)
         else:
-            value = inp[1:]
-            match char1:
-                case '!':
-                    op = '!='
-                case '=':
-                    op = '=='
-                case _:
-                    op = char1
-    else:
-        op = '=='
-        value = inp
+            selection = data[mask]
+        engine.update(mask)
 
-    criterion['op'] = op
-    criterion['value'] = value
+    return {'data': selection,
+            'stats': engine.agg(stat_list),
+            'n': selection[selection.columns[0]].count(),
+            'filter': {'data': data, 'expr': expr, 'rows': rows}}
 
-    if do_debug:
-        print(f'in function: {sys._getframe().f_code.co_name}')
-        print(f'...called by: {sys._getframe().f_back.f_code.co_name}')
-        print(f'vallidate input: {inp}')
-        print()
-        print(f'char1, char2: {char1}, {char2}')
-        if char1 not in ['!', '=', '>', '<']:
-            print(f'setting filter criterion to: ' == ' {value}')
-        print(f'validated op, value: {op}, {value}')
-        print('---------')
-        print()
 
-    return criterion
+@instrument.timed()
+def show_stats(result: dict) -> None:
+    """Display the statistics computed by filter_task()."""
+    global last_stats
 
+    last_stats = result
+    if group_by.get() != '':
+        stat_n_lab.configure(text='n = ' + str(result['n']))
+        request_group_stats()
+        return
 
-def check_filter_data(value, data_type):
-    """Check for mismatch between data type and the filter criterion."""
-    data_status = {'err': 0, 'quote': ''}
+    windows["stats"].configure(state='normal')
+    windows["stats"].delete('1.0', tk.END)
+    with pd.option_context('display.float_format', '{:0.2f}'.format):
+        windows["stats"].insert('1.0', result['stats'])
 
-    # ...int or float will pass this test
-    if value.replace('.', '', 1).isnumeric():
-        if data_type == 'object':
-            data_status['err'] = -4
-    else:
-        # value to check is not numeric, see if data is numeric
-        if data_type == 'int64' or data_type == 'float64':
-            data_status['err'] = -5
-        data_status['quote'] = '\"'
+    style_df_text(windows["stats"], stat_list)
 
-    return data_status
+    nvalue = 'n = ' + str(result['n'])
+    stat_n_lab.configure(text=nvalue)
 
 
-def report_filter(res):
-    match res:
-        case -1:
-            # in the current case, this should not happen.
-            set_status('Data item not specified.')
-        case -2:
-            # valid and invalid filter rows
-            set_status('At least one invalid filter criterion.')
-        case -3:
-            set_status('No filter defined.')
-        case -4:
-            # e.g. 'gender' + '>55'
-            set_status("Can\'t compare numeric filter to string data.")
-        case -5:
-            # e.g. 'age' + 'older'
-            set_status("Can\'t compare filter string to numeric data.")
-        case _:
-            set_status('ok')
+def group_by_selected(ev: object) -> None:
+    """Combobox callback: show grouped, or overall, statistics."""
+    show_stats(last_stats)
 
 
-def apply_filter(data: pd.core.frame.DataFrame,
-                 expr: str, 
-                 windows: dict) -> None:
-    """Apply a data filter to a pandas DataFrame.
+def request_group_stats() -> None:
+    """Show the statistics of data_current for each group, from the cache if possible."""
+    by = group_by.get()
+    key = (filter_summary, by)
 
-    The query() function requires cleaning column names. Another method
-    is to use a series of terms like: df[col] > 55.
-    """
-    global data_current
+    cached = group_stats_cache.get(data_1, key)
+    if cached is not None:
+        show_group_stats(cached)
+        return
 
-    data_current = data.query(expr)
-    # print(data_current)
-    show_filtered(data_current, windows)
-    
+    # the dataset may be replaced before the task is done
+    dataset = data_1
+
+    def done(stats: pd.DataFrame) -> None:
+        group_stats_cache.put(dataset, key, stats)
+        show_group_stats(stats)
+
+    tasks.submit('group_stats', group_task, data_current, by, list(stats_dict),
+                 on_done=done)
+
+
+@instrument.timed()
+def group_task(data: pd.DataFrame,
+               by: str,
+               columns: list) -> pd.DataFrame:
+    """Worker thread: the statistics of each group of data."""
+    return Plan(data).group_by(by).agg(stat_list, columns).collect()
 
-def show_filtered(data: pd.core.frame.DataFrame, 
-                  windows: dict) -> None:
-    """Display results of filtering a dataset."""
-    windows["data"].configure(state='normal')
-    windows["data"].delete('1.0', tk.END)
-    windows["data"].insert('1.0', data)
-    windows["data"].tag_add('redtext', '1.0', '1.end')
-    windows["data"].configure(state='disabled')
 
-    stats_agg = data.agg(stats_dict)
+def show_group_stats(stats: pd.DataFrame) -> None:
     windows["stats"].configure(state='normal')
     windows["stats"].delete('1.0', tk.END)
-    with pd.option_context('display.float_format', '{:0.2f}'.format):
-        windows["stats"].insert('1.0', stats_agg)
+    with pd.option_context('display.float_format', '{:0.2f}'.format,
+                           'display.max_rows', None):
+        windows["stats"].insert('1.0', stats.to_string())
 
-    style_df_text(windows["stats"], stat_list)
+    # bold header line only
+    style_df_text(windows["stats"], [])
 
-    nvalue = 'n = ' + str(data.count().iloc[0])
-    stat_n_lab.configure(text=nvalue)
+
+@instrument.timed()
+def show_filtered(result: dict, 
+                  windows: dict) -> None:
+    """Display results of filtering a dataset."""
+    global data_current, current_filter
+
+    data_current = result['data']
+    current_filter = result['filter']
+    data_view.show(data_current, 'redtext')
+    show_stats(result)
+    schedule_plot_update()
 
     data_filter_btn.configure(style='MyButton2.TButton')
 
-    if data.empty:
+    if data_current.empty:
         set_status('No data found.')
 
 
+def open_filter_sets() -> None:
+    """Window for the statistics of several filter sets, entered one per line."""
+    win = tk.Toplevel(root)
+    win.title('statistics per filter set')
+
+    sets_lab = ttk.Label(win, text='filter sets, one per line, e.g.: age>55 & gender=M')
+    sets_lab.pack(anchor='w', padx=5, pady=5)
+
+    sets_txt = tk.Text(win, width=60, height=6, borderwidth=2, relief='sunken')
+    sets_txt.pack(padx=5, fill='x')
+    if filter_summary != '':
+        sets_txt.insert('1.0', filter_summary + '\n')
+
+    result_txt = tk.Text(win, width=80, height=20,
+                         background='beige',
+                         foreground='black',
+                         wrap='none',
+                         borderwidth=2,
+                         relief='sunken')
+
+    def show(stats: pd.DataFrame) -> None:
+        result_txt.configure(state='normal')
+        result_txt.delete('1.0', tk.END)
+        with pd.option_context('display.float_format', '{:0.2f}'.format,
+                               'display.max_rows', None):
+            result_txt.insert('1.0', stats.to_string())
+        result_txt.configure(state='disabled')
+        set_status('')
+
+    def run() -> None:
+        lines = [line for line in sets_txt.get('1.0', tk.END).splitlines()
+                 if line.strip() != '']
+        if not lines:
+            set_status('No filter defined.')
+            return
+
+        # each line is a filter expression, e.g. age>55 & (gender=M | gender=U)
+        tasks.submit('filter_sets', filter_sets_stats, data_1, lines, column_indexes,
+                     on_done=show)
+
+    run_btn = ttk.Button(win, text='stats', command=run)
+    run_btn.pack(anchor='w', padx=5, pady=5)
+    result_txt.pack(padx=5, pady=5, fill='both', expand=True)
+
+
+def open_diagnostics() -> None:
+    """Window with the timings recorded by instrument.py (do_profile)."""
+    win = tk.Toplevel(root)
+    win.title('diagnostics')
+
+    diag_txt = tk.Text(win, width=100, height=30,
+                       background='beige',
+                       foreground='black',
+                       wrap='none',
+                       borderwidth=2,
+                       relief='sunken')
+
+    def show() -> None:
+        summary = pd.DataFrame(instrument.summary(),
+                               columns=['function', 'calls', 'total (s)', 'mean (s)',
+                                        'max (s)', 'rows in', 'rows out'])
+        recent = pd.DataFrame([(e.name, e.thread, e.seconds, e.rows_in, e.rows_out, e.bytes)
+                               for e in list(instrument.events)[-20:]],
+                              columns=['function', 'thread', 'seconds',
+                                       'rows in', 'rows out', 'bytes'])
+        diag_txt.configure(state='normal')
+        diag_txt.delete('1.0', tk.END)
+        with pd.option_context('display.float_format', '{:0.4f}'.format):
+            diag_txt.insert('1.0', f'{summary.to_string(index=False)}\n\n'
+                                   f'most recent calls:\n{recent.to_string(index=False)}\n\n'
+                                   f'mask cache: {mask_cache.cache_info()}')
+        diag_txt.configure(state='disabled')
+
+    def clear() -> None:
+        instrument.clear()
+        show()
+
+    def export() -> None:
+        path = filedialog.asksaveasfilename(parent=win,
+                                            defaultextension='.json',
+                                            initialfile='trace.json')
+        if path:
+            instrument.export_chrome_trace(path)
+            set_status(f'trace written: {os.path.basename(path)}')
+
+    btn_fr = ttk.Frame(win)
+    ttk.Button(btn_fr, text='refresh', command=show).pack(side='left', padx=5)
+    ttk.Button(btn_fr, text='clear', command=clear).pack(side='left', padx=5)
+    ttk.Button(btn_fr, text='export trace...', command=export).pack(side='left', padx=5)
+    btn_fr.pack(anchor='w', pady=5)
+    diag_txt.pack(padx=5, pady=5, fill='both', expand=True)
+
+    show()
+
+
+@instrument.timed()
 def data_unfilter(data: pd.core.frame.DataFrame, 
                   windows: dict) -> None:
-    """Display the complete dataset."""
-    global data_current
+    """Display the complete dataset.
 
-    data_current = data
-    windows["data"].configure(state='normal')
-    windows["data"].delete('1.0', tk.END)
-    windows["data"].insert('1.0', data)
-    windows["data"].tag_add('bluetext', '1.0', '1.end')
-    windows["data"].configure(state='disabled')
+    Statistics are displayed when the worker thread has computed them.
+    """
+    global data_current, filter_summary, current_filter, active_filter
 
-    stats_agg = data_current.agg(stats_dict)
-    windows["stats"].configure(state='normal')
-    windows["stats"].delete('1.0', tk.END)
-    with pd.option_context('display.float_format', '{:0.2f}'.format):
-        windows["stats"].insert('1.0', stats_agg)
+    data_current = data
+    filter_summary = ''
+    current_filter = None
+    active_filter = None
+    data_view.show(data, 'bluetext')
+    schedule_plot_update()
 
-    style_df_text(windows["stats"], stat_list)
+    tasks.submit('filter', filter_task, data, None, stats_engine, column_indexes,
+                 None, new_filter_cancel(),
+                 on_done=show_stats)
 
-    nvalue = 'n = ' + str(data_current.count().iloc[0])
-    stat_n_lab.configure(text=nvalue)
     # print(f'{nvalue=}')
     data_unfilter_btn.configure(style = 'MyButton3.TButton')
     data_filter_btn.configure(style = 'MyButton1.TButton')
 
     set_status('')
 
-    if do_debug:
-        print(f'in function: {sys._getframe().f_code.co_name}')
-        print(f'...called by: {sys._getframe().f_back.f_code.co_name}')
-        print(f'locals are: {locals().keys()}')
-        func = data_unfilter
-        print(f'    co_varnames: {func.__code__.co_varnames}')
-        print(f'    co_argcount: {func.__code__.co_argcount}')
-        print(f'    co_nlocals: {func.__code__.co_nlocals}')
-        print()
 
+def get_plot_canvas() -> object:
+    """The embedded figure: created, and matplotlib imported, on the first plot."""
+    global plot_canvas
+
+    if plot_canvas is None:
+        from plot_canvas import PlotCanvas
 
+        plot_canvas = PlotCanvas(plot_label_fr)
+        plot_canvas.frame.pack(padx=5, pady=5, fill='both', expand=True)
+
+    return plot_canvas
+
+
+@instrument.timed()
 def line_plot(data: pd.DataFrame,
               xcol: tk.StringVar,
               ycol: tk.StringVar) -> None:
     """Create line plot (the default) for the current dataset."""
+    global last_plot
+
     xdata = xcol.get()
     ydata = ycol.get()
-    sorted = data.sort_values(by=xdata)
 
-    # ? or use data.plot.line for explicitness
-    sorted.plot(x=xdata, y=ydata)
-    plt.show()
+    @instrument.timed('line_plot draw')
+    def draw(sorted: pd.DataFrame) -> None:
+        get_plot_canvas().line(plot_prep.plot_values(sorted[xdata]),
+                         plot_prep.plot_values(sorted[ydata]),
+                         xdata, ydata)
 
-    if do_debug:
-        print(f'in function: {sys._getframe().f_code.co_name}')
-        print(f'...called by: {sys._getframe().f_back.f_code.co_name}')
-        print('line_plot params:')
-        print(f'   xcol: {xcol} = {xdata}')
-        print(f'   ycol: {ycol} = {ydata}')
-        print()
+    # also called for live updates, with the columns chosen now
+    def request(data: pd.DataFrame) -> None:
+        prepare = instrument.timed('line_data')(plot_prep.line_data)
+        tasks.submit('line', prepare, data, xdata, ydata, line_max_points,
+                     on_done=draw)
 
+    request(data)
+    last_plot = request
 
+
+@instrument.timed()
 def bar_plot(data: pd.DataFrame,
              xcol: tk.StringVar,
-             ycol: tk.StringVar) -> None:
+             ycol: tk.StringVar,
+             agg: tk.StringVar) -> None:
     """Create bar plot for the current dataset."""
+    global last_plot
 
     xdata = xcol.get()
     ydata = ycol.get()
-    dfsort = data.sort_values(by=xdata)
+    how = agg.get()
 
-    dfsort.plot.bar(x=xdata, y=ydata)
-    plt.show()
+    @instrument.timed('bar_plot draw')
+    def draw(dfsort: pd.DataFrame) -> None:
+        # y is the aggregate column, e.g. 'rest_EF (mean)', if aggregated
+        ylabel = dfsort.columns[1]
+        get_plot_canvas().bar(plot_prep.tick_labels(dfsort[xdata]),
+                        plot_prep.plot_values(dfsort[ylabel]),
+                        xdata, ylabel)
 
-    if do_debug:
-        print(f'in function: {sys._getframe().f_code.co_name}')
-        print(f'...called by: {sys._getframe().f_back.f_code.co_name}')
-        print('bar_plot params:')
-        print(f'   xcol: {xcol} = {xdata}')
-        print(f'   ycol: {ycol} = {ydata}')
-        print()
+    def request(data: pd.DataFrame) -> None:
+        prepare = instrument.timed('bar_data')(plot_prep.bar_data)
+        tasks.submit('bar', prepare, data, xdata, ydata, how, bar_max_bars,
+                     on_done=draw)
+
+    request(data)
+    last_plot = request
 
 
-def create_plot(data: pd.DataFrame,
+@instrument.timed()
+def create_plot(result: dict,
                 source: dict,
-                cat: str | None) -> None:
-    """Execute the scatter plot."""
-    if cat is None:
-        colormap = None
-    else:
-        colormap = 'viridis'
+                title: str) -> None:
+    """Execute the scatter plot, from the arrays prepared by scatter_data()."""
+    get_plot_canvas().scatter(result['x'], result['y'],
+                        source['x'], source['y'], title,
+                        codes=result['codes'], categories=result['categories'])
 
-    data.plot.scatter(x=source['x'],
-                      y=source['y'],
-                      c=cat,
-                      cmap=colormap,
-                      alpha=0.5,
-                      s=40)
 
+@instrument.timed()
+def create_density_plot(grid: tuple,
+                        source: dict,
+                        title: str) -> None:
+    """Draw a large scatter plot as a 2D histogram of the point density."""
+    get_plot_canvas().density(grid, source['x'], source['y'], title)
 
+
+@instrument.timed()
 def scatter_plot(data: pd.DataFrame,
                  ent: object,
                  x_variable: tk.StringVar,
                  y_variable: tk.StringVar) -> None:
     """Create scatter plot for the current dataset.
     
-    Makes a copy of the DataFrame object passed in, to avoid mutating it.
+    The plot data is prepared on the worker thread (scatter_data).
     """
-    global data_current
-
-    data_copy = pd.DataFrame(data_current)
-    # print(f'data_current:\n{data_current}')
-    # print(f'data_copy:\n{data_copy}')
-    # print(f'data:\n{data}')
-    # print()
+    global data_current, last_plot
 
     source = {'x': x_variable.get(),
               'y': y_variable.get()}
@@ -587,33 +1104,147 @@ def scatter_plot(data: pd.DataFrame,
         # pass
         # catlist = catlist.strip().split(',')
 
-    if category != '':
-        # if not catlist: print('not catlist')
-        # if ((not catlist) or catlist == None or (not isinstance(catlist, list))):
-        if ((not catlist) or (not isinstance(catlist, list))):
-            print('\nWARNING: no category list; finding category values...\n')
-            data_copy[category] = data_copy[category].astype('category')
-            plot_data = data_copy
+    def draw(result: dict, summary: str) -> None:
+        number_of_points = result['n']
+
+        # print(f'plot_data:\n{plot_data}')
+        if result['grid'] is not None:
+            number_of_points += ', density'
+        elif result['shown'] < int(result['n']):
+            number_of_points += f', {result["shown"]} plotted'
+
+        # n is always the number of records, not of points plotted
+        if summary == '':
+            mytitle = 'All Data ' + ' (n = ' + number_of_points + ')'
+        else:
+            mytitle = summary + ' (n = ' + number_of_points + ')'
+
+        if result['grid'] is not None:
+            create_density_plot(result['grid'], source, mytitle)
         else:
-            # print(f'{catlist=}')
-            # print(f'data_copy:\n{data_copy}')
-            # print(f'\n{category=}')
-            data_copy[category] = pd.Categorical(data_copy[category], categories=catlist, ordered=False)
-            plot_data = data_copy[data_copy[category].isin(catlist)]
+            create_plot(result, source, mytitle)
+
+    def request(data: pd.DataFrame, report: bool = False) -> None:
+        # the title shows the filter at the time of the request
+        summary = filter_summary
+
+        def done(result: dict) -> None:
+            global dataset_codes
+
+            # codes computed by the task are kept, if still for the dataset
+            if result['dataset_codes']['data'] is data_1:
+                dataset_codes = result['dataset_codes']
+            draw(result, summary)
+            if report:
+                report_plot_memory(result)
+
+        tasks.submit('scatter', scatter_data, data, source, category, catlist,
+                     dataset_codes, on_done=done)
+
+    request(data_current, report=report_plot_memory_use)
+    last_plot = request
+
+
+@instrument.timed()
+def scatter_data(data: pd.DataFrame,
+                 source: dict,
+                 category: str,
+                 catlist: list,
+                 codes: dict) -> dict:
+    """Worker thread: prepare the scatter plot data.
+
+    Only the x and y columns of the selected records are read; the
+    category is represented by its integer codes, taken from the codes of
+    the dataset (codes, see category_codes) for the selected rows. The
+    data is not copied, and no column is converted. codes is not changed:
+    codes computed here are returned in a new dict, for the main thread.
+    Returns a dict of:
+        x, y:       the values to plot (numpy arrays)
+        codes:      category code of each point, or None
+        categories: the category names, in code order, or None; without a
+                    category list, missing values are the last category
+        dataset_codes: codes, or a new dict with the codes computed here
+        n:          the number of records, as a string
+        shown:      the number of points to plot
+        grid:       histogram_grid() result, for a density plot, else None
+        bytes:      memory used by the plot arrays
+        row_bytes:  memory used by a copy of the selected records
+
+    Above scatter_max_points records, plots without a category are binned
+    (if scatter_density), others are plotted from a stratified sample.
+    """
+    if isinstance(data, RowSelection):
+        base, rows = data.data, data.rows
     else:
-        plot_data = data_copy
-        category = None
+        base, rows = data, None
 
-    # print(f'plot_data:\n{plot_data}')
-    create_plot(plot_data, source, category)
-    number_of_points = str(data_current.count().iloc[0])
+    x = plot_prep.plot_values(data[source['x']])
+    y = plot_prep.plot_values(data[source['y']])
 
-    if filter_summary == '':
-        mytitle = 'All Data ' + ' (n = ' + number_of_points + ')'
-    else:
-        mytitle = filter_summary + ' (n = ' + number_of_points + ')'
-    plt.title(mytitle)
-    plt.show()
+    point_codes = None
+    categories = None
+    if category != '':
+        if base is not codes['data'] or category not in codes['codes']:
+            # e.g. a string column that was not made Categorical: once per dataset
+            known = codes['codes'] if base is codes['data'] else {}
+            codes = {'data': base,
+                     'codes': {**known, **plot_prep.category_codes(base, [category])}}
+        point_codes, categories = codes['codes'][category]
+        if rows is not None:
+            point_codes = point_codes[rows]
+
+        if catlist and isinstance(catlist, list):
+            # values not in catlist are not plotted
+            point_codes = plot_prep.remap_codes(point_codes, categories, catlist)
+            keep = point_codes >= 0
+            x, y, point_codes = x[keep], y[keep], point_codes[keep]
+            categories = catlist
+        else:
+            print('\nWARNING: no category list; finding category values...\n')
+            missing = point_codes < 0
+            if missing.any():
+                # code -1 would get the color of the first category
+                point_codes = np.where(missing, len(categories), point_codes)
+                categories = categories + ['missing']
+
+    number_of_points = str(data[data.columns[0]].count())
+
+    grid = None
+    if len(x) > scatter_max_points:
+        if point_codes is None and scatter_density:
+            grid = plot_prep.histogram_grid(x, y)
+        else:
+            sample_codes = point_codes
+            if sample_codes is None:
+                sample_codes = np.zeros(len(x), dtype=np.int8)
+            keep = plot_prep.stratified_rows(sample_codes, scatter_max_points)
+            x, y = x[keep], y[keep]
+            if point_codes is not None:
+                point_codes = point_codes[keep]
+
+    plot_bytes = x.nbytes + y.nbytes
+    if point_codes is not None:
+        plot_bytes += point_codes.nbytes
+    if grid is not None:
+        plot_bytes = grid[0].nbytes + grid[1].nbytes + grid[2].nbytes
+    row_bytes = base.memory_usage(index=False).sum() / max(len(base), 1) * len(data)
+
+    return {'x': x,
+            'y': y,
+            'codes': point_codes,
+            'categories': categories,
+            'dataset_codes': codes,
+            'n': number_of_points,
+            'shown': len(x),
+            'grid': grid,
+            'bytes': plot_bytes,
+            'row_bytes': row_bytes}
+
+
+def report_plot_memory(result: dict) -> None:
+    """Status bar: memory used by the plot data, and by a copy of the records."""
+    set_status(f'plot data: {result["bytes"] / 2**20:.2f} MB '
+               f'(a copy of the records: {result["row_bytes"] / 2**20:.2f} MB)')
 
 
 # ===== END Functions =====
@@ -628,6 +1259,9 @@ def scatter_plot(data: pd.DataFrame,
 root = ThemedTk()
 root.title = 'myocardial strain'
 
+# runs data work off the Tk thread; see worker.py
+tasks = TaskRunner(root, on_busy=show_busy, on_error=report_task_error)
+
 styles_ttk.create_styles()
 
 # flag for external module(s)
@@ -649,14 +1283,26 @@ y_text = 'y'
 # Read the dataset
 # ================
 # subset of 21 records
-data_0 = pd.read_csv('data/strain_nml_sample.csv')
+data_file = 'data/strain_nml_sample.csv'
+
+# Only the column names are read now: the dataset is read and prepared on
+# the worker thread once the window is shown (see window_shown). Until then
+# the dataset is empty.
+# in Arrow mode, the cache is the csv converted as it is (write_csv)
+dataset_cache = DatasetCache(data_file, raw=use_arrow_mode)
+loader = None
 
 # entire 91 records, slightly different columns
 # data_1 = pd.read_csv('data/strain_nml.csv')
 
-data_1 = clean_column_names(data_0)
+# the columns of the csv, for the loader (usecols): all are displayed
+csv_columns = list(pd.read_csv(data_file, nrows=0).columns)
+data_1 = clean_column_names(pd.DataFrame(columns=csv_columns))
 data_columns = list(data_1.columns)
 
+# category codes for scatter plots, computed once per dataset
+dataset_codes = {'data': data_1, 'codes': {}}
+
 # to update the display after filtering
 data_current = data_1
 
@@ -680,17 +1326,16 @@ windows["data"] = data_win
 
 data_win.tag_configure("bluetext", foreground='blue')
 data_win.tag_configure("redtext", foreground='red')
-data_win.tag_add('bluetext', '1.0', '1.end')
-
-data_win.insert('1.0', data_current)
-data_win.configure(state='disabled')
 
 data_win.pack(side='left', pady=5, fill='x', expand=True)
 
-data_scroll = ttk.Scrollbar(data_ui, orient='vertical', command=data_win.yview)
+# the scrollbar is driven by data_view, which positions it over the whole
+# dataset, not the lines in data_win
+data_scroll = ttk.Scrollbar(data_ui, orient='vertical')
 data_scroll.pack(side='right', fill='y', pady=5)
 
-data_win['yscrollcommand'] = data_scroll.set
+data_view = DataView(data_win, data_scroll)
+data_view.show(data_current, 'bluetext')
 
 
 # Statistics UI
@@ -706,6 +1351,20 @@ stat_lab.pack(anchor='w')
 stat_n_lab = ttk.Label(stat_ui, text='n')
 stat_n_lab.pack(anchor='w', padx=10)
 
+# statistics for each value of a category (values set with category_list)
+group_by_fr = ttk.Frame(stat_ui)
+group_by_lab = ttk.Label(group_by_fr, text='group by:')
+group_by = tk.StringVar(value='')
+group_by_cb = ttk.Combobox(group_by_fr,
+                           textvariable=group_by,
+                           state='readonly',
+                           exportselection=False,
+                           width=10)
+group_by_cb.bind('<<ComboboxSelected>>', group_by_selected)
+group_by_lab.pack(side='left')
+group_by_cb.pack(side='left', padx=5)
+group_by_fr.pack(anchor='w', padx=10)
+
 stat_win = tk.Text(stat_ui, width=50, height=10,
                      background='beige',
                      foreground='black',
@@ -719,17 +1378,32 @@ stat_win.pack(side='left', padx=10, pady=5, fill='x', expand=True)
 stat_scroll.pack(side='right', fill='y', pady=5)
 stat_win['yscrollcommand'] = stat_scroll.set
 
-# for a good summary of skew and kurtosis, see medium.com
-stat_list = ['mean', 'std', 'min', 'median', 'max', 'skew', 'kurtosis']
-
+# these are set for each dataset by dataset_ready():
+# the numeric columns, with the statistics to compute
 stats_dict = {}
-for c in data_1.columns:
-    if data_1[c].dtype == 'int64' or data_1[c].dtype == 'float64':
-        # numeric_cols.append(c)
-        stats_dict[c] = stat_list
+
+# sorted indexes of the numeric columns (after clean_column_names()), and
+# category indexes of the Categorical columns
+column_indexes = None
+
+# histograms, distinct and missing values of the columns, for the 'n ≈'
+# estimate of the filter panel and the filter planner
+column_stats = None
+
+# keeps the statistics of the current selection of data_1
+stats_engine = StatsEngine(data_1, list(stats_dict))
 
 # stats_agg = data_1.agg(stats_dict)
-stats_agg = data_current.agg(stats_dict)
+# stats_agg = data_current.agg(stats_dict)
+stats_agg = stats_engine.agg(stat_list)
+
+# the latest filter_task() result, for show_stats()
+last_stats = {'data': data_current,
+              'stats': stats_agg,
+              'n': 0}
+
+# grouped statistics, by (filter_summary, group column), for data_1
+group_stats_cache = ResultCache(maxsize=16)
 
 # get the number of rows in the data that have a 'pt code' (are valid records):
 # method 1: the chosen method, the most succinct way I can find that uses
@@ -749,13 +1423,11 @@ stats_agg = data_current.agg(stats_dict)
 # method 4: simple, does not use a pandas function
 # print(f'items in data_current: {len(data_current)}')
 
-nvalue = 'n = ' + str(data_current.count().iloc[0])
-stat_n_lab.configure(text=nvalue)
+# the statistics are displayed by show_stats(), when the dataset is ready
 
 # Format floating point values
 # method 1: format for display but don't change the DataFrame
-with pd.option_context('display.float_format', '{:0.2f}'.format):
-    stat_win.insert('1.0', stats_agg)
+# (see show_stats)
 
 # method 2: create a new DataFrame with formatted values.
 # Preserves stats for the whole dataset, for possible later conparison to
@@ -824,24 +1496,63 @@ data_filter_btn = ttk.Button(filter_fr,
                         # command=lambda d=data_1,
                         #                w=windows,
                         #                ir=msel.MultiSelectFrame.get_item_rows(): data_filter(d, w, ir)
-                        command=lambda d=data_1,
-                                       w=windows: data_filter(d, w)
+                        command=lambda w=windows: data_filter(data_1, w)
                         )
 
 data_filter_btn.pack(side='left', padx=5, pady=10)
 
+# expected number of records of the filter being edited (show_estimate)
+estimate_lab = ttk.Label(filter_fr, text='', width=12)
+estimate_lab.pack(side='left', padx=5, pady=10)
+
 data_unfilter_btn = ttk.Button(filter_ui,
                         text='show all data',
                         style='MyButton3.TButton',
-                        command=lambda d=data_1, 
-                                       w=windows: data_unfilter(d, w))
+                        command=lambda w=windows: data_unfilter(data_1, w))
 data_unfilter_btn.pack(side='bottom', pady=5)
 
+filter_sets_btn = ttk.Button(filter_ui,
+                        text='filter sets...',
+                        command=open_filter_sets)
+filter_sets_btn.pack(side='bottom', pady=5)
+
 filter_fr.pack(padx=10, pady=10, fill='both')
 
+# a filter with or, not and parentheses; used instead of the rows if given
+expression_fr = ttk.Frame(filter_ui)
+expression_lab = ttk.Label(expression_fr, text='expression:')
+expression_lab.pack(side='left', padx=5)
+filter_expression = tk.StringVar()
+expression_ent = ttk.Entry(expression_fr, textvariable=filter_expression, width=30)
+expression_ent.pack(side='left', padx=5, fill='x', expand=True)
+expression_ent.bind('<Return>', lambda ev: data_filter(data_1, windows))
+expression_fr.pack(padx=10, pady=5, fill='x')
+
 # try: 04-22-2025
 filter_summary = ''
 
+# the filter on display: {'data', 'expr', 'rows'}, or None for all data
+current_filter = None
+
+# the filter last applied, or None: applied again to a new dataset
+active_filter = None
+
+# set to cancel the filter being evaluated (see new_filter_cancel)
+filter_cancel = threading.Event()
+
+# filter while the criteria are typed
+live_filter = tk.IntVar(value=0)
+live_filter_chkb = ttk.Checkbutton(filter_ui,
+                                   text='live',
+                                   variable=live_filter)
+live_filter_chkb.pack(side='bottom', pady=5)
+live_filter_id = None
+root.bind_all('<KeyRelease>', filter_edited, add='+')
+root.bind_all('<<ComboboxSelected>>', filter_edited, add='+')
+
+# masks of recent filter terms, for data_1
+mask_cache = fcomp.MaskCache(maxsize=32)
+
 # plotting UI
 # ===========
 plot_label_fr = ttk.Frame(root, border=2, relief='raised')
@@ -856,7 +1567,7 @@ line_data_y = tk.StringVar()
 
 btn_line_plot = ttk.Button(plotting_main,
                 text='Line',
-                command=lambda df=data_current, x=line_data_x, y=line_data_y: line_plot(df, x, y))
+                command=lambda x=line_data_x, y=line_data_y: line_plot(data_current, x, y))
 
 line_x_fr = msel.ComboboxFrame(plotting_main,
                                cb_values=data_columns,
@@ -886,10 +1597,11 @@ line_y_fr = msel.ComboboxFrame(plotting_main,
 # bar_data = tk.StringVar(value=data_columns[2])
 bar_data_x = tk.StringVar()
 bar_data_y = tk.StringVar()
+bar_agg = tk.StringVar(value='auto')
 
 btn_bar_plot = ttk.Button(plotting_main,
                text='Bar',
-               command=lambda df=data_current, x=bar_data_x, y=bar_data_y: bar_plot(df, x, y))
+               command=lambda x=bar_data_x, y=bar_data_y, a=bar_agg: bar_plot(data_current, x, y, a))
 
 bar_x_fr = msel.ComboboxFrame(plotting_main,
                               cb_values=data_columns[1:],
@@ -910,6 +1622,21 @@ bar_y_fr = msel.ComboboxFrame(plotting_main,
                               posn=[1, 2]
                               )
 
+bar_agg_fr = msel.ComboboxFrame(plotting_main,
+                                cb_values=['auto', 'mean', 'median', 'count'],
+                                display_name='agg',
+                                name='bar_agg',
+                                var=bar_agg,
+                                width=7,
+                                posn=[1, 3]
+                                )
+
+# redraw the current plot when the filter changes
+live_plot = tk.IntVar(value=1)
+live_plot_chkb = ttk.Checkbutton(plotting_main,
+                                 text='live',
+                                 variable=live_plot)
+
 # ---------- Scatter plot
 scatter_x = tk.StringVar()
 scatter_y = tk.StringVar()
@@ -928,7 +1655,7 @@ scatter_select_fr = ttk.Frame(scatter_setup_fr)
 scatter_plot_btn = ttk.Button(scatter_select_fr,
                    text='Scatter',
                    width=6,
-                   command=lambda df=data_current, ent=category_values_entry, x=scatter_x, y=scatter_y: scatter_plot(df, ent, x, y)
+                   command=lambda ent=category_values_entry, x=scatter_x, y=scatter_y: scatter_plot(data_current, ent, x, y)
                    # command=lambda ent=category_values_entry, x=scatter_x, y=scatter_y: scatter_plot(ent, x, y)
                    )
 
@@ -964,6 +1691,9 @@ use_category_chkb.bind('<Button-1>', chkb_extra)
 category_list = ['', 'gender']
 cat_var = tk.Variable(value=category_list)
 
+# the same categories group the statistics
+group_by_cb['values'] = category_list
+
 category_lb= tk.Listbox(scatter_setup_fr,
                         exportselection=False,
                         height=2,
@@ -1014,6 +1744,7 @@ y_spacing = 5
 # plotting
 btn_line_plot.grid(row=0, column=0, padx=5, pady=y_spacing, sticky=tk.W)
 btn_bar_plot.grid(row=1, column=0, padx=5, pady=y_spacing, sticky=tk.W)
+live_plot_chkb.grid(row=0, column=3, padx=5, pady=y_spacing, sticky=tk.W)
 
 scatter_setup_fr.grid(row=2, column=0, columnspan=3, padx=5, pady=y_spacing,
                       ipadx=5, ipady=5)
@@ -1022,6 +1753,13 @@ scatter_plot_btn.grid(row=0, column=0, padx=5, sticky=tk.W)
 
 plotting_main.pack(padx=5, pady=5, fill='both')
 
+# all plots are drawn here, in one embedded figure (see get_plot_canvas)
+plot_canvas = None
+
+# the current plot, as a function of the data; redrawn on filter changes
+last_plot = None
+plot_update_id = None
+
 # status bar
 # ----------
 status_fr = ttk.Frame(root, relief='groove')
@@ -1033,8 +1771,19 @@ status_lab = ttk.Label(status_fr, text='status: ')
 status_txt = tk.StringVar()
 status_bar = ttk.Label(status_fr, textvariable=status_txt)
 
+loader_cancel_btn = ttk.Button(status_fr, text='cancel', width=6,
+                               command=lambda: loader.cancel())
+
+# shown by show_busy() while the worker thread is running tasks
+busy_bar = ttk.Progressbar(status_fr, mode='indeterminate', length=80)
+
+diagnostics_btn = ttk.Button(status_fr, text='diagnostics',
+                             command=open_diagnostics)
+
 status_lab.pack(side='left', padx=3, pady=3)
 status_bar.pack(side='left', padx=3, pady=3, expand=True, fill='both')
+if do_profile:
+    diagnostics_btn.pack(side='right', padx=3, pady=3)
 
 
 # main UI sections
@@ -1047,20 +1796,10 @@ status_fr.grid(row=2, column=0, columnspan=2, padx=5, sticky='ew')
 
 btnq.grid(row=3, column=0, columnspan=2, padx=10, pady=10)
 
-# inspect functions in this module
-# =================
-if do_profile:
-    import inspect
-
-    all_module_fxn = [obj for name, obj in inspect.getmembers(sys.modules[__name__]) 
-                        if (inspect.isfunction(obj) and
-                            obj.__module__ == __name__)]
-    for f in all_module_fxn:
-        print(f.__name__)
-        # parameter names and type hints
-        sig = (inspect.signature(f))
-        print(f'   signature: {sig}')
-    print()
+# read the dataset, once the window is shown
+# ==========================================
+startup_window = None
+root.bind('<Expose>', window_shown)
 
 if __name__ == "__main__":
     root.mainloop()
@@ -0,0 +1,242 @@
+"""
+program: plan.py
+
+purpose: a lazy filter -> project -> aggregate pipeline over a dataset,
+         run in one pass that reads only the columns it needs.
+
+comments: A Plan records the steps, e.g.
+
+              Plan(data).filter(expr).select(['age', 'rest_EF']).collect()
+              Plan(data).filter(expr).group_by('gender').agg(stat_list).collect()
+
+          and nothing is computed until collect() (or mask(), rows()). The
+          plan knows every column it uses (columns_needed), so the engine
+          reads only those: the filter columns to evaluate the mask, then
+          the projected or aggregated columns of the selected rows. No
+          full-width filtered DataFrame is made.
+
+          rows() gives the selected rows as a RowSelection (row positions),
+          for the data display, which formats only the visible rows.
+
+          An engine runs a plan:
+          - PandasEngine (the default): compiled filter masks, with the mask
+            cache and column indexes when given; statistics from
+            stats_engine (masked_stats, group_stats).
+          - PolarsEngine: the same plan as a Polars LazyFrame query, built
+            from the needed columns only. Needs the polars package.
+          Both return pandas objects in the same layout.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Filters may have Or and Not nodes.
+10-18-2026  Add the estimate of the filter planner.
+10-18-2026  Add cancelled, checked while the filter is evaluated.
+"""
+
+import numpy as np
+import pandas as pd
+
+import filter_compile as fcomp
+from row_selection import RowSelection, select_columns
+from stats_engine import masked_stats, group_stats
+
+
+class Plan:
+    """Lazy pipeline: filter, then select columns or aggregate."""
+
+    def __init__(self, data: pd.DataFrame | RowSelection,
+                 cache: fcomp.MaskCache | None = None,
+                 indexes: object = None,
+                 estimate: callable = None,
+                 cancelled: callable = None):
+        self.data = data
+        self.cache = cache
+        self.indexes = indexes
+        self.estimate = estimate   # selectivity of a term, for the filter planner
+        self.cancelled = cancelled  # if it becomes true, the filter raises Cancelled
+        self.expr = None
+        self.columns = None      # projection
+        self.by = None           # group column
+        self.stat_list = None    # aggregation
+        self.stat_columns = None
+        self._mask = None        # shared by plans with the same filter
+
+    def _copy(self) -> 'Plan':
+        plan = Plan(self.data, self.cache, self.indexes, self.estimate, self.cancelled)
+        plan.__dict__.update(self.__dict__)
+        return plan
+
+    def filter(self, expr: fcomp.And | None) -> 'Plan':
+        plan = self._copy()
+        plan.expr = expr
+        plan._mask = None
+        return plan
+
+    def select(self, columns: list) -> 'Plan':
+        plan = self._copy()
+        plan.columns = list(columns)
+        return plan
+
+    def group_by(self, by: str) -> 'Plan':
+        plan = self._copy()
+        plan.by = by
+        return plan
+
+    def agg(self, stat_list: list, columns: list | None = None) -> 'Plan':
+        """Aggregate columns (default: the integer and float columns)."""
+        plan = self._copy()
+        plan.stat_list = stat_list
+        if columns is None:
+            columns = [c for c in self.data.columns
+                       if pd.api.types.is_integer_dtype(self.data[c].dtype) or
+                       pd.api.types.is_float_dtype(self.data[c].dtype)]
+        plan.stat_columns = list(columns)
+        return plan
+
+    def filter_columns(self) -> list:
+        if self.expr is None:
+            return []
+        return self.expr.columns()
+
+    def output_columns(self) -> list:
+        if self.stat_list is not None:
+            columns = list(self.stat_columns)
+            if self.by is not None:
+                columns.append(self.by)
+            return columns
+        if self.columns is not None:
+            return list(self.columns)
+
+        return list(self.data.columns)
+
+    def columns_needed(self) -> list:
+        """Every column the plan reads: those of the filter and of the output."""
+        return list(dict.fromkeys(self.filter_columns() + self.output_columns()))
+
+    def mask(self) -> np.ndarray:
+        """Boolean mask of the selected rows (computed once)."""
+        if self._mask is None:
+            if self.expr is None:
+                self._mask = np.ones(len(self.data), dtype=bool)
+            elif isinstance(self.data, RowSelection):
+                # filter columns of the selected rows only
+                frame = select_columns(self.data, self.filter_columns())
+                self._mask = self.expr.mask(frame)
+            else:
+                self._mask = self.expr.mask(self.data, self.cache, self.indexes,
+                                            self.estimate, self.cancelled)
+
+        return self._mask
+
+    def rows(self) -> RowSelection:
+        """The selected rows, all columns, as row positions (no copy)."""
+        if isinstance(self.data, RowSelection):
+            return RowSelection(self.data.data, self._selected_positions())
+
+        return RowSelection(self.data, self.mask())
+
+    def _selected_positions(self) -> np.ndarray:
+        """For a RowSelection source: mask over the underlying DataFrame."""
+        full = np.zeros(len(self.data.data), dtype=bool)
+        full[self.data.rows[self.mask()]] = True
+        return full
+
+    def collect(self, engine: 'PandasEngine | PolarsEngine | None' = None) -> pd.DataFrame:
+        """Run the plan: a DataFrame of the selected columns, or the statistics."""
+        if engine is None:
+            engine = PandasEngine()
+
+        return engine.run(self)
+
+
+class PandasEngine:
+    """Runs a plan with compiled masks and the stats_engine functions."""
+
+    def run(self, plan: Plan) -> pd.DataFrame:
+        mask = plan.mask()
+
+        if plan.stat_list is None:
+            return select_columns(plan.rows(), plan.output_columns())
+
+        if plan.by is None:
+            return masked_stats(plan.data, plan.stat_columns, mask[np.newaxis, :],
+                                plan.stat_list)[0]
+
+        frame = select_columns(plan.rows(), plan.output_columns())
+
+        return group_stats(frame, plan.by, plan.stat_columns, plan.stat_list)
+
+
+class PolarsEngine:
+    """Runs a plan as a Polars LazyFrame query, on the needed columns only."""
+
+    # Polars names of the stat_list statistics
+    stats = {'mean': lambda c: c.mean(),
+             'std': lambda c: c.std(ddof=1),
+             'min': lambda c: c.min(),
+             'median': lambda c: c.median(),
+             'max': lambda c: c.max(),
+             'skew': lambda c: c.skew(bias=False),
+             'kurtosis': lambda c: c.kurtosis(fisher=True, bias=False)}
+
+    def __init__(self):
+        import polars
+        self.pl = polars
+
+    def run(self, plan: Plan) -> pd.DataFrame:
+        pl = self.pl
+        source = select_columns(plan.data, plan.columns_needed())
+        # categories as strings: comparisons are to the filter value
+        for c in source.columns:
+            if isinstance(source[c].dtype, pd.CategoricalDtype):
+                source[c] = source[c].astype(object)
+        query = pl.from_pandas(source).lazy()
+
+        if plan.expr is not None:
+            query = query.filter(self.expression(plan.expr))
+
+        if plan.stat_list is None:
+            return query.select(plan.output_columns()).collect().to_pandas()
+
+        aggs = [self.stats[s](pl.col(c).cast(pl.Float64)).alias(f'{c}\t{s}')
+                for c in plan.stat_columns for s in plan.stat_list]
+
+        if plan.by is None:
+            result = query.select(aggs).collect().row(0)
+            values = np.array(result, dtype='float64').reshape(len(plan.stat_columns), -1)
+            return pd.DataFrame(values.T, index=plan.stat_list, columns=plan.stat_columns)
+
+        groups = (query.filter(pl.col(plan.by).is_not_null())
+                  .group_by(plan.by).agg(aggs).sort(plan.by).collect())
+        keys = groups[plan.by].to_list()
+        index = pd.MultiIndex.from_product([keys, plan.stat_list], names=[plan.by, 'stat'])
+        data = {c: np.column_stack([groups[f'{c}\t{s}'].cast(pl.Float64).to_numpy()
+                                    for s in plan.stat_list]).ravel()
+                for c in plan.stat_columns}
+
+        return pd.DataFrame(data, index=index, columns=plan.stat_columns)
+
+    def expression(self, expr: object) -> object:
+        """The filter as a Polars expression; like query(), missing values are only !=."""
+        pl = self.pl
+        if isinstance(expr, fcomp.Term):
+            test = fcomp.OPS[expr.op](pl.col(expr.column), expr.value)
+            if expr.op == '!=':
+                test = test | pl.col(expr.column).is_null()
+            return test.fill_null(False)
+        if isinstance(expr, fcomp.Not):
+            return ~self.expression(expr.child)
+
+        if isinstance(expr, fcomp.Or):
+            result = pl.lit(False)
+            for c in expr.children:
+                result = result | self.expression(c)
+        else:
+            result = pl.lit(True)
+            for c in expr.children:
+                result = result & self.expression(c)
+
+        return result
@@ -0,0 +1,192 @@
+"""
+program: plot_canvas.py
+
+purpose: one matplotlib figure, embedded in the plotting panel and reused
+         by every plot.
+
+comments: Creating a figure and calling plt.show() for each plot pays for
+          figure construction and backend startup on every click. Here the
+          Figure and its FigureCanvasTkAgg are created once.
+
+          Plotting the same kind of plot with the same columns again (e.g.
+          after a filter change) does not rebuild the axes: the data of the
+          existing artist is replaced, with Line2D.set_data() or
+          PathCollection.set_offsets(), and the figure is updated by
+          blitting: the saved background (axes, ticks, labels) is restored,
+          and only the data and the title are drawn again. The axes limits
+          only grow, so while the new data fits in the current view (as it
+          does for a narrower filter) nothing else needs to be drawn. When
+          it does not fit, the limits are widened and the figure is drawn
+          in full.
+
+          Bar and density plots are always drawn in full.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+import matplotlib.colors as mcolors
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
+
+class PlotCanvas:
+    """An embedded figure with a single axes, redrawn in place."""
+
+    def __init__(self, parent: tk.Widget,
+                 figsize: tuple = (5, 3.5),
+                 dpi: int = 100):
+        self.frame = ttk.Frame(parent)
+        self.figure = Figure(figsize=figsize, dpi=dpi, layout='constrained')
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.frame)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.frame,
+                                            pack_toolbar=False)
+        self.toolbar.pack(side='bottom', fill='x')
+        self.canvas.get_tk_widget().pack(side='top', fill='both', expand=True)
+
+        self.ax = None
+        self.key = None          # (kind, x, y, ...) of the current plot
+        self.artist = None       # Line2D or PathCollection, for updates
+        self.title = None
+        self.has_limits = False  # limits have been set from data
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def line(self, x: np.ndarray, y: np.ndarray,
+             xlabel: str, ylabel: str, title: str = '') -> None:
+        key = ('line', xlabel, ylabel)
+        if key == self.key:
+            self.artist.set_data(x, y)
+            self._update(x, y, title)
+            return
+
+        self._reset(key, xlabel, ylabel, title)
+        self.artist, = self.ax.plot(x, y, animated=True)
+        self._set_limits(x, y)
+        self.canvas.draw_idle()
+
+    def scatter(self, x: np.ndarray, y: np.ndarray,
+                xlabel: str, ylabel: str, title: str = '',
+                codes: np.ndarray | None = None,
+                categories: list | None = None) -> None:
+        """Scatter plot; codes (0 .. len(categories) - 1) select the colors."""
+        key = ('scatter', xlabel, ylabel, None if categories is None else tuple(categories))
+        if key == self.key:
+            self.artist.set_offsets(np.column_stack([x, y]))
+            if codes is not None:
+                self.artist.set_array(codes)
+            self._update(x, y, title)
+            return
+
+        self._reset(key, xlabel, ylabel, title)
+        if codes is None:
+            self.artist = self.ax.scatter(x, y, alpha=0.5, s=40, animated=True)
+        else:
+            norm = mcolors.Normalize(vmin=0, vmax=max(len(categories) - 1, 1))
+            self.artist = self.ax.scatter(x, y, c=codes, cmap='viridis', norm=norm,
+                                          alpha=0.5, s=40, animated=True)
+            # the legend is part of the background: it only depends on the categories
+            handles = [Line2D([], [], linestyle='', marker='o', alpha=0.5,
+                              color=self.artist.cmap(norm(i)))
+                       for i in range(len(categories))]
+            self.ax.legend(handles, categories)
+        self._set_limits(x, y)
+        self.canvas.draw_idle()
+
+    def bar(self, labels: list, heights: np.ndarray,
+            xlabel: str, ylabel: str, title: str = '') -> None:
+        self._reset(('bar', xlabel, ylabel), xlabel, ylabel, title)
+        positions = np.arange(len(heights))
+        self.ax.bar(positions, heights)
+        self.ax.set_xticks(positions, [str(v) for v in labels], rotation=90)
+        self.canvas.draw_idle()
+
+    def density(self, grid: tuple,
+                xlabel: str, ylabel: str, title: str = '') -> None:
+        """Draw a density_grid() result (counts, xedges, yedges)."""
+        counts, xedges, yedges = grid
+
+        self._reset(('density', xlabel, ylabel), xlabel, ylabel, title)
+        # empty bins are left blank; log scale, since counts vary widely
+        mesh = self.ax.pcolormesh(xedges, yedges,
+                                  np.ma.masked_equal(counts, 0),
+                                  cmap='viridis',
+                                  norm=mcolors.LogNorm())
+        self.figure.colorbar(mesh, ax=self.ax, label='records')
+        self.canvas.draw_idle()
+
+    def _reset(self, key: tuple, xlabel: str, ylabel: str, title: str) -> None:
+        """Start a new plot: clear the figure and make a new axes."""
+        self.figure.clear()
+        self.ax = self.figure.add_subplot()
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.title = self.ax.set_title(title, animated=True)
+        self.key = key
+        self.artist = None
+        self.has_limits = False
+        self.background = None
+
+    def _update(self, x: np.ndarray, y: np.ndarray, title: str) -> None:
+        """Show new data in the current artist: blit, or redraw if the limits change."""
+        self.title.set_text(title)
+        if self._set_limits(x, y) or self.background is None:
+            self.canvas.draw_idle()
+            return
+
+        self.canvas.restore_region(self.background)
+        self._draw_animated()
+        self.canvas.blit(self.figure.bbox)
+
+    def _set_limits(self, x: np.ndarray, y: np.ndarray) -> bool:
+        """Widen the axes limits to include x, y; return True if they changed."""
+        changed = False
+        for values, get_lim, set_lim in [(x, self.ax.get_xlim, self.ax.set_xlim),
+                                         (y, self.ax.get_ylim, self.ax.set_ylim)]:
+            values = np.asarray(values)
+            if values.dtype.kind not in 'iuf':
+                # e.g. strings on a line plot: matplotlib's own units handle it
+                self.ax.relim()
+                self.ax.autoscale_view()
+                changed = True
+                continue
+
+            values = values[np.isfinite(values)]
+            if len(values) == 0:
+                continue
+            low, high = values.min(), values.max()
+            margin = 0.05 * (high - low) if high > low else 0.5
+
+            if not self.has_limits:
+                # first data for this axes: limits from the data only
+                set_lim(low - margin, high + margin)
+                changed = True
+            else:
+                cur_low, cur_high = get_lim()
+                if low < cur_low or high > cur_high:
+                    set_lim(min(cur_low, low - margin), max(cur_high, high + margin))
+                    changed = True
+
+        self.has_limits = True
+
+        return changed
+
+    def _on_draw(self, event: object) -> None:
+        """After a full draw: save the background, then draw the animated artists."""
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self) -> None:
+        if self.ax is None:
+            return
+        if self.artist is not None:
+            self.ax.draw_artist(self.artist)
+        self.ax.draw_artist(self.title)
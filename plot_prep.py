@@ -0,0 +1,273 @@
+"""
+program: plot_prep.py
+
+purpose: reduce large datasets to what a plot can show, before they are
+         handed to matplotlib.
+
+comments: Drawing every point of a scatter plot with millions of records
+          takes matplotlib minutes, and the points overlap anyway. Two
+          reductions are provided:
+          - stratified_sample(): a random sample in which each category
+            keeps its share of the records, so the category colors of the
+            plot are not distorted.
+          - density_grid(): counts of records in a 2D grid of bins, drawn
+            as an image (a 2D histogram) instead of points.
+
+          For line and bar plots, whose cost grows with the number of rows:
+          - aggregate_by_x(): one value (mean, median or count) per x value,
+            or per bin of x when a numeric x has too many values.
+          - lttb(): Largest-Triangle-Three-Buckets downsampling of a line,
+            which keeps the points that shape the line (peaks and dips).
+
+          The scatter plot is prepared from arrays: x, y and the integer
+          codes of the category, which category_codes() computes once per
+          dataset. A category list is applied by remapping codes
+          (remap_codes), so no column is converted or copied;
+          stratified_rows() and histogram_grid() work on these arrays.
+
+          These functions don't use matplotlib, so they can run on the
+          worker thread.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Add aggregate_by_x() and lttb(), for line and bar plots.
+10-18-2026  Add plot_values().
+10-18-2026  Move line_data() and bar_data() here from main.py.
+10-18-2026  Add array versions for the scatter plot: category_codes(),
+            remap_codes(), stratified_rows() and histogram_grid().
+10-18-2026  Add tick_labels(), for the labels of bar plots.
+"""
+
+import numpy as np
+import pandas as pd
+
+from row_selection import select_columns
+
+
+def stratified_sample(data: pd.DataFrame,
+                      n_max: int,
+                      category: str | None = None,
+                      seed: int = 0) -> pd.DataFrame:
+    """Sample at most n_max rows, keeping the share of each category.
+
+    category must be a Categorical column (or None, for a simple random
+    sample). Rows keep their original order.
+    """
+    if len(data) <= n_max:
+        return data
+
+    if category is None:
+        codes = np.zeros(len(data), dtype=np.int8)
+    else:
+        codes = data[category].cat.codes.to_numpy()
+
+    return data.iloc[stratified_rows(codes, n_max, seed)]
+
+
+def stratified_rows(codes: np.ndarray,
+                    n_max: int,
+                    seed: int = 0) -> np.ndarray:
+    """Positions (sorted) of at most n_max rows, keeping the share of each code."""
+    if len(codes) <= n_max:
+        return np.arange(len(codes))
+
+    rng = np.random.default_rng(seed)
+
+    # code -1 (missing) is counted in group 0
+    groups = codes.astype(np.int64) + 1
+    counts = np.bincount(groups)
+    quota = counts * n_max // len(codes)
+
+    order = np.argsort(groups, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    parts = [rng.choice(order[offsets[g]:offsets[g + 1]], quota[g], replace=False)
+             for g in range(len(counts)) if quota[g] > 0]
+    rows = np.concatenate(parts) if parts else np.array([], dtype=np.int64)
+
+    return np.sort(rows)
+
+
+def density_grid(data: pd.DataFrame,
+                 xcol: str,
+                 ycol: str,
+                 bins: int = 200) -> tuple:
+    """Count records in a bins x bins grid over the x, y range.
+
+    Returns (counts, xedges, yedges), with counts indexed [y, x] as
+    pcolormesh expects. Records with a missing x or y are not counted.
+    """
+    return histogram_grid(data[xcol].to_numpy(dtype='float64', na_value=np.nan),
+                          data[ycol].to_numpy(dtype='float64', na_value=np.nan),
+                          bins)
+
+
+def histogram_grid(x: np.ndarray, y: np.ndarray, bins: int = 200) -> tuple:
+    """density_grid() for x and y arrays."""
+    valid = ~(np.isnan(x) | np.isnan(y))
+
+    counts, xedges, yedges = np.histogram2d(x[valid], y[valid], bins=bins)
+
+    return counts.T, xedges, yedges
+
+
+def category_codes(data: pd.DataFrame, columns: list) -> dict:
+    """Integer codes and category names of columns: {column: (codes, categories)}.
+
+    For a Categorical column these are its own codes (not a copy); other
+    columns are factorized. Missing values have code -1. Columns that are
+    not in data are left out.
+    """
+    codes = {}
+    for c in columns:
+        if c not in data.columns:
+            continue
+        if isinstance(data[c].dtype, pd.CategoricalDtype):
+            values = data[c].array
+            codes[c] = (values.codes, [str(v) for v in values.categories])
+        else:
+            values, uniques = pd.factorize(data[c], sort=True)
+            codes[c] = (values, [str(v) for v in uniques])
+
+    return codes
+
+
+def remap_codes(codes: np.ndarray,
+                categories: list,
+                catlist: list) -> np.ndarray:
+    """Codes for the categories in catlist (in its order); -1 for the others."""
+    lookup = np.full(len(categories) + 1, -1, dtype=np.int16)
+    for i, name in enumerate(catlist):
+        if name in categories:
+            lookup[categories.index(name)] = i
+
+    # code -1 (missing) reads the last entry, which is -1
+    return lookup[codes]
+
+
+def sort_for_plot(data: pd.DataFrame,
+                  xdata: str,
+                  ydata: str) -> pd.DataFrame:
+    """The plotted columns, sorted by x."""
+    return select_columns(data, [xdata, ydata]).sort_values(by=xdata)
+
+
+def line_data(data: pd.DataFrame,
+              xdata: str,
+              ydata: str,
+              max_points: int) -> pd.DataFrame:
+    """Sorted columns, downsampled to max_points (LTTB) if x is numeric."""
+    sorted = sort_for_plot(data, xdata, ydata)
+    if len(sorted) <= max_points or not pd.api.types.is_numeric_dtype(sorted[xdata].dtype):
+        return sorted
+
+    sorted = sorted.dropna()
+    x = sorted[xdata].to_numpy(dtype='float64')
+    y = sorted[ydata].to_numpy(dtype='float64')
+
+    return sorted.iloc[lttb(x, y, max_points)]
+
+
+def bar_data(data: pd.DataFrame,
+             xdata: str,
+             ydata: str,
+             how: str,
+             max_bars: int) -> pd.DataFrame:
+    """One bar per record, or y aggregated by x.
+
+    how is 'mean', 'median' or 'count'; 'auto' means one bar per record, or
+    the mean if there would be more than max_bars bars.
+    """
+    if how == 'auto':
+        if len(data) <= max_bars:
+            return sort_for_plot(data, xdata, ydata)
+        how = 'mean'
+
+    return aggregate_by_x(select_columns(data, [xdata, ydata]),
+                          xdata, ydata, how,
+                          max_groups=max_bars)
+
+
+def plot_values(values: pd.Series) -> np.ndarray:
+    """A column as a numpy array for matplotlib: float64 (NaN for missing)
+    if numeric, else strings.
+    """
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return values.to_numpy(dtype='float64', na_value=np.nan)
+
+    return values.astype(str).to_numpy()
+
+
+def tick_labels(values: pd.Series) -> list:
+    """Bar labels: floats (e.g. bin midpoints) rounded for display."""
+    return [f'{v:.4g}' if isinstance(v, float) else str(v) for v in values]
+
+
+def aggregate_by_x(data: pd.DataFrame,
+                   xcol: str,
+                   ycol: str,
+                   how: str = 'mean',
+                   max_groups: int | None = None) -> pd.DataFrame:
+    """Aggregate y for each value of x: 'mean', 'median' or 'count'.
+
+    If x is numeric and has more than max_groups values, it is divided into
+    max_groups equal-width bins, labeled by their exact midpoints (round
+    them for display, e.g. bar labels). Returns a
+    DataFrame of x and the aggregate, which is named e.g. 'rest_EF (mean)'.
+    """
+    x = data[xcol]
+
+    if (max_groups is not None and
+            pd.api.types.is_numeric_dtype(x.dtype) and
+            x.nunique() > max_groups):
+        values = x.to_numpy(dtype='float64', na_value=np.nan)
+        edges = np.linspace(np.nanmin(values), np.nanmax(values), max_groups + 1)
+        bins = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, max_groups - 1)
+        # group by bin number (missing x: no group); label by exact midpoint
+        valid = ~np.isnan(values)
+        result = data[ycol][valid].groupby(bins[valid], sort=True).agg(how)
+        mids = (edges[:-1] + edges[1:]) / 2
+        return pd.DataFrame({xcol: mids[result.index.to_numpy()],
+                             f'{ycol} ({how})': result.to_numpy()})
+
+    result = data[ycol].groupby(x, sort=True, observed=True).agg(how)
+
+    return pd.DataFrame({xcol: result.index, f'{ycol} ({how})': result.to_numpy()})
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of n_out points of a line (x sorted), by Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept. The points between are divided into
+    n_out - 2 buckets; from each bucket, the point kept is the one making
+    the largest triangle with the point kept from the previous bucket and
+    the average of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i < n_out - 3:
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # twice the triangle area, for each point in the bucket
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) -
+                      (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
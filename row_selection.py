@@ -0,0 +1,100 @@
+"""
+program: row_selection.py
+
+purpose: filtered rows of a DataFrame, kept as row positions instead of a
+         new DataFrame.
+
+comments: A RowSelection supports the few DataFrame operations that the
+          application uses on the current (filtered) data: len(), empty,
+          count(), iloc[start:stop] for the rows on display, and
+          selection[column(s)]. Only the rows or columns that are asked for
+          are copied, so a filter on a memory-mapped Arrow dataset does not
+          copy the dataset.
+
+          format_rows() gives the text of the rows on display, for the data
+          window (data_view.py) and the benchmark, without importing tkinter.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Add format_rows(), from data_view.py.
+10-18-2026  count() reads only the selected rows, not whole columns.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class _RowsIndexer:
+    """iloc for a RowSelection: positions are relative to the selection."""
+
+    def __init__(self, selection: 'RowSelection'):
+        self.selection = selection
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            rows, cols = key
+            return self.selection.data.iloc[self.selection.rows[rows], cols]
+
+        return self.selection.data.iloc[self.selection.rows[key]]
+
+
+class RowSelection:
+    """The rows of a DataFrame where a boolean mask is True."""
+
+    def __init__(self, data: pd.DataFrame, mask: np.ndarray):
+        self.data = data
+        self.rows = np.flatnonzero(mask)
+        self.columns = data.columns
+        self.iloc = _RowsIndexer(self)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.rows) == 0 or len(self.columns) == 0
+
+    def __getitem__(self, key):
+        """The selected rows of a column (Series) or list of columns."""
+        return self.data[key].take(self.rows)
+
+    def count(self, block_rows: int = 1 << 20) -> pd.Series:
+        """Number of non-missing values in each column, like DataFrame.count().
+
+        Only the selected rows are read, block_rows at a time.
+        """
+        counts = {}
+        for c in self.columns:
+            values = self.data[c].array
+            counts[c] = sum(len(part) - np.count_nonzero(values.take(part).isna())
+                            for part in (self.rows[i:i + block_rows]
+                                         for i in range(0, len(self.rows), block_rows)))
+
+        return pd.Series(counts)
+
+
+def select_columns(data: pd.DataFrame | RowSelection, columns: list) -> pd.DataFrame:
+    """A new DataFrame with some columns of a DataFrame or RowSelection.
+
+    The column arrays are shared with data where possible, not copied;
+    assigning a column of the result does not change data.
+    """
+    return pd.DataFrame({c: data[c] for c in columns}, copy=False)
+
+
+def format_rows(rows: pd.DataFrame, col_space: dict) -> str:
+    """The text of some rows, with the header.
+
+    col_space holds the minimum width of each column, and is widened to
+    fit these rows, so columns don't shift from one page to the next.
+    """
+    if not rows.empty:
+        for c in rows.columns:
+            col_text = rows[[c]].to_string(index=False, header=False)
+            width = max([len(str(c))] + [len(s) for s in col_text.split('\n')])
+            col_space[c] = max(col_space.get(c, 0), width)
+
+    return rows.to_string(col_space=col_space)
@@ -0,0 +1,460 @@
+"""
+program: stats_engine.py
+
+purpose: descriptive statistics for a filtered dataset, updated from the
+         rows that enter or leave the filter rather than from all rows.
+
+comments: For each numeric column the engine keeps the sufficient statistics
+          of the current selection: count and the sums of x, x^2, x^3, x^4,
+          with x the value less a shift. The shift starts as the column mean
+          of the complete dataset. Power sums about a point far from the
+          mean of the selection (relative to its spread), or from which
+          rows far from it were added and removed, lose the precision of
+          the third and fourth moments: the column is then centered on the
+          mean of the selection, and its sums recomputed, before the
+          statistics are taken (_recenter).
+          mean, std, skew and kurtosis are computed from these moments, with
+          the same bias corrections that pandas uses, so the statistics
+          panel shows the same values as data.agg(stats_dict).
+
+          The median is exact (a selection, np.median) for selections up to
+          exact_limit rows. For larger selections it is interpolated from a
+          fixed-bin histogram that is also updated incrementally.
+
+          By default the engine keeps, for each column, the values as
+          float64, the centered values, a validity mask and the histogram
+          bin of each row: about 25 bytes per row per column, for fast
+          updates. With low_memory (Arrow mode, for datasets larger than
+          memory) it keeps none of these: the values of the rows that are
+          visited are read from the dataset, block_rows at a time, and
+          centered and binned as they are read. Only the selection mask
+          (1 byte per row) is kept.
+
+          masked_stats() computes the statistics of many selections at once,
+          from a matrix of masks (one row per selection): the counts and
+          sums of all selections come from one matrix product per column;
+          the higher powers are then taken about the mean of each selection.
+
+          group_stats() computes the statistics of each group of rows that
+          share a value of a (category) column, with one groupby().agg()
+          pass: min, median and max, and the count and power sums from
+          which the other statistics are computed, as for the engine.
+          group_stats_parallel() divides the groups among the processes of
+          a process pool, for data with many groups.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+10-18-2026  Add masked_stats(), for many selections in one pass.
+10-18-2026  Add group_stats() and group_stats_parallel().
+10-18-2026  Add low_memory, for memory-mapped Arrow datasets: no per-row
+            copies of the columns; values are read block by block.
+10-18-2026  Take the higher moments of the engine about the mean of the
+            selection, not of the dataset, when they would lose precision.
+10-18-2026  masked_stats(): higher moments about the mean of each selection.
+10-18-2026  group_stats(): higher moments about the mean of each group.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+class StatsEngine:
+    """Streaming-moment statistics for a row selection of a DataFrame."""
+
+    # largest ratio of the mean fourth power of x (and of the rows added and
+    # removed) to m2 ** 2 before a column is centered on the selection
+    precision_limit = 1e6
+
+    def __init__(self, data: pd.DataFrame,
+                 columns: list,
+                 nbins: int = 1024,
+                 exact_limit: int = 100_000,
+                 low_memory: bool = False,
+                 block_rows: int = 1 << 20):
+        self.columns = columns
+        self.nbins = nbins
+        self.exact_limit = exact_limit
+        self.nrows = len(data)
+        self.low_memory = low_memory
+        self.block_rows = block_rows
+        self.data = data if low_memory else None
+
+        self.values = {}
+        self.shift = {}
+        self.centered = {}
+        self.valid = {}
+        self.bins = {}
+        self.edges = {}
+
+        for c in columns:
+            if low_memory:
+                count, total, lo, hi = 0, 0.0, np.nan, np.nan
+                for start in range(0, self.nrows, block_rows):
+                    v = data[c].iloc[start:start + block_rows].to_numpy(dtype='float64',
+                                                                         na_value=np.nan)
+                    v = v[~np.isnan(v)]
+                    if v.size:
+                        count += v.size
+                        total += v.sum()
+                        lo = np.nanmin([lo, v.min()])
+                        hi = np.nanmax([hi, v.max()])
+                self.shift[c] = total / count if count else 0.0
+                self.edges[c] = np.linspace(lo, hi, nbins + 1) if count else np.zeros(nbins + 1)
+                continue
+
+            v = data[c].to_numpy(dtype='float64', na_value=np.nan)
+            valid = ~np.isnan(v)
+            shift = v[valid].mean() if valid.any() else 0.0
+
+            self.values[c] = v
+            self.shift[c] = shift
+            self.valid[c] = valid
+            self.centered[c] = np.where(valid, v - shift, 0.0)
+
+            # histogram bin of each row, for the approximate median.
+            # Invalid (NaN) rows go in an extra bin that is never read.
+            if valid.any():
+                edges = np.linspace(v[valid].min(), v[valid].max(), nbins + 1)
+            else:
+                edges = np.zeros(nbins + 1)
+            self.edges[c] = edges
+            self.bins[c] = self._bin(c, v, valid).astype(np.int32)
+
+        self.mask = None
+        self.moments = {}
+        self.hist = {}
+        self.min = {}
+        self.max = {}
+        # sum of x^4 of the rows added and removed since the last recompute
+        self.churn = {}
+        # columns centered on the current selection
+        self.recentered = set()
+
+        self.reset()
+
+    def reset(self) -> None:
+        """Select all rows."""
+        self._recompute(np.ones(self.nrows, dtype=bool))
+
+    def update(self, mask: np.ndarray) -> None:
+        """Change the selection to the rows where mask is True.
+
+        Only the rows that were added to or removed from the selection are
+        visited, unless that is more rows than the new selection itself.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        added = np.flatnonzero(mask & ~self.mask)
+        removed = np.flatnonzero(self.mask & ~mask)
+
+        if len(added) + len(removed) >= np.count_nonzero(mask):
+            self._recompute(mask)
+            return
+
+        for c in self.columns:
+            moments, hist, lo, hi = self._scan(c, self._blocks(added))
+            self.moments[c] += moments
+            self.churn[c] += moments[4]
+            self.hist[c] += hist
+            if not np.isnan(lo):
+                self.min[c] = np.nanmin([self.min[c], lo])
+                self.max[c] = np.nanmax([self.max[c], hi])
+
+            moments, hist, lo, hi = self._scan(c, self._blocks(removed))
+            self.moments[c] -= moments
+            self.churn[c] += moments[4]
+            self.hist[c] -= hist
+            if not np.isnan(lo) and (lo <= self.min[c] or hi >= self.max[c]):
+                # an extreme value left the selection: no way around a rescan
+                _, _, self.min[c], self.max[c] = self._scan(c, self._mask_blocks(mask))
+
+        self.mask = mask.copy()
+        self.recentered.clear()
+
+    def agg(self, stat_list: list) -> pd.DataFrame:
+        """Return the statistics in the layout of data.agg(stats_dict)."""
+        stats = {}
+        for c in self.columns:
+            all_stats = self._stats(c)
+            stats[c] = [all_stats[s] for s in stat_list]
+
+        return pd.DataFrame(stats, index=stat_list)
+
+    def _recompute(self, mask: np.ndarray) -> None:
+        mask = np.asarray(mask, dtype=bool)
+        for c in self.columns:
+            self.moments[c], self.hist[c], self.min[c], self.max[c] = \
+                self._scan(c, self._mask_blocks(mask))
+            self.churn[c] = 0.0
+
+        self.mask = mask.copy()
+        self.recentered.clear()
+
+    def _conditioned(self, c: str) -> bool:
+        """Whether the power sums of c still give its higher moments."""
+        n, s1, s2, _, s4 = self.moments[c]
+        if n < 1 or c in self.recentered:
+            return True
+
+        m2 = max(s2 / n - (s1 / n) ** 2, 0.0)
+        return (s4 + self.churn[c]) / n <= self.precision_limit * m2 ** 2
+
+    def _recenter(self, c: str) -> None:
+        """Center c on the mean of the selection, and recompute its sums."""
+        n, s1 = self.moments[c][:2]
+        self.shift[c] += s1 / n
+        if not self.low_memory:
+            valid = self.valid[c]
+            self.centered[c] = np.where(valid, self.values[c] - self.shift[c], 0.0)
+
+        self.moments[c] = self._scan(c, self._mask_blocks(self.mask))[0]
+        self.churn[c] = 0.0
+        self.recentered.add(c)
+
+    def _blocks(self, rows: np.ndarray) -> list:
+        """Row positions, in blocks (one block, unless low_memory)."""
+        if not self.low_memory:
+            return [rows]
+
+        return [rows[i:i + self.block_rows] for i in range(0, len(rows), self.block_rows)]
+
+    def _mask_blocks(self, mask: np.ndarray) -> object:
+        """The positions of the rows where mask is True, in blocks."""
+        if not self.low_memory:
+            yield np.flatnonzero(mask)
+            return
+
+        for start in range(0, len(mask), self.block_rows):
+            yield np.flatnonzero(mask[start:start + self.block_rows]) + start
+
+    def _values(self, c: str, rows: np.ndarray) -> np.ndarray:
+        """float64 values of some rows (NaN for missing)."""
+        if not self.low_memory:
+            return self.values[c][rows]
+
+        return self.data[c].array.take(rows).to_numpy(dtype='float64', na_value=np.nan)
+
+    def _bin(self, c: str, v: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        bins = np.clip(np.searchsorted(self.edges[c], v, side='right') - 1, 0, self.nbins - 1)
+        bins[~valid] = self.nbins
+        return bins
+
+    def _scan(self, c: str, blocks: object) -> tuple:
+        """(moments, histogram, min, max) of the rows of blocks."""
+        moments = np.zeros(5)
+        hist = np.zeros(self.nbins + 1, dtype=np.int64)
+        lo = hi = np.nan
+
+        for rows in blocks:
+            if self.low_memory:
+                v = self._values(c, rows)
+                valid = ~np.isnan(v)
+                x = np.where(valid, v - self.shift[c], 0.0)
+                bins = self._bin(c, v, valid)
+            else:
+                v = self.values[c][rows]
+                valid = self.valid[c][rows]
+                x = self.centered[c][rows]
+                bins = self.bins[c][rows]
+
+            x2 = x * x
+            moments += [np.count_nonzero(valid), x.sum(), x2.sum(), (x2 * x).sum(), (x2 * x2).sum()]
+            hist += np.bincount(bins, minlength=self.nbins + 1)
+
+            v = v[valid]
+            if v.size:
+                lo = np.nanmin([lo, v.min()])
+                hi = np.nanmax([hi, v.max()])
+
+        return moments, hist, lo, hi
+
+    def _median(self, c: str, n: int) -> float:
+        if n == 0:
+            return np.nan
+        if n <= self.exact_limit:
+            v = self._values(c, np.flatnonzero(self.mask))
+            return np.median(v[~np.isnan(v)])
+
+        # interpolate within the histogram bin that holds the middle value
+        counts = self.hist[c][:self.nbins]
+        cum = np.cumsum(counts)
+        half = n / 2
+        b = int(np.searchsorted(cum, half))
+        below = cum[b] - counts[b]
+        lo, hi = self.edges[c][b], self.edges[c][b + 1]
+
+        return lo + (hi - lo) * (half - below) / counts[b]
+
+    def _stats(self, c: str) -> dict:
+        if not self._conditioned(c):
+            self._recenter(c)
+        n, s1, s2, s3, s4 = self.moments[c]
+        n = int(round(n))
+
+        stats = {'min': self.min[c],
+                 'median': self._median(c, n),
+                 'max': self.max[c]}
+        stats.update(moment_stats(n, s1, s2, s3, s4, self.shift[c]))
+
+        return stats
+
+
+def moment_stats(n: int, s1: float, s2: float, s3: float, s4: float,
+                 shift: float) -> dict:
+    """mean, std, skew and kurtosis from the count and power sums of x - shift."""
+    stats = {'mean': np.nan, 'std': np.nan, 'skew': np.nan, 'kurtosis': np.nan}
+
+    if n == 0:
+        return stats
+
+    # moments about the mean of the selection (x is centered on shift)
+    mean = s1 / n
+    m2 = max(s2 / n - mean ** 2, 0.0)
+    m3 = s3 / n - 3 * mean * s2 / n + 2 * mean ** 3
+    m4 = s4 / n - 4 * mean * s3 / n + 6 * mean ** 2 * s2 / n - 3 * mean ** 4
+
+    stats['mean'] = mean + shift
+    if n > 1:
+        stats['std'] = np.sqrt(m2 * n / (n - 1))
+
+    # like pandas, report 0 for (near) constant data
+    flat = m2 <= 1e-14 * max(1.0, abs(mean + shift)) ** 2
+    if n > 2:
+        stats['skew'] = 0.0 if flat else \
+            np.sqrt(n * (n - 1)) / (n - 2) * m3 / m2 ** 1.5
+    if n > 3:
+        stats['kurtosis'] = 0.0 if flat else \
+            (n - 1) / ((n - 2) * (n - 3)) * ((n + 1) * m4 / m2 ** 2 - 3 * (n - 1))
+
+    return stats
+
+
+def masked_stats(data: pd.DataFrame,
+                 columns: list,
+                 masks: np.ndarray,
+                 stat_list: list,
+                 max_cells: int = 2 ** 24) -> list:
+    """Statistics of several row selections: one DataFrame per row of masks.
+
+    masks is a (selections x rows) boolean matrix. Each DataFrame has the
+    layout of StatsEngine.agg(). Selections are processed in groups of at
+    most max_cells matrix elements, to bound the memory used.
+    """
+    masks = np.asarray(masks, dtype=bool)
+    nsel, nrows = masks.shape
+    step = max(1, max_cells // max(nrows, 1))
+    results = [{} for _ in range(nsel)]
+
+    for c in columns:
+        v = data[c].to_numpy(dtype='float64', na_value=np.nan)
+        valid = ~np.isnan(v)
+        shift = v[valid].mean() if valid.any() else 0.0
+        x = np.where(valid, v - shift, 0.0)
+        first = np.column_stack([valid, x])
+
+        for start in range(0, nsel, step):
+            group = masks[start:start + step]
+            counts, sums = (group.astype('float64') @ first).T
+
+            # the higher powers are taken about the mean of each selection
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = np.where(counts > 0, sums / counts, 0.0)
+            dx = np.where(group & valid, x - means[:, None], 0.0)
+            dx2 = dx * dx
+            powers = np.column_stack([counts, dx.sum(axis=1), dx2.sum(axis=1),
+                                      (dx2 * dx).sum(axis=1), (dx2 * dx2).sum(axis=1)])
+
+            # min, median and max with the unselected rows as NaN
+            values = np.where(group & valid, v, np.nan)
+            with warnings.catch_warnings():
+                # all-NaN row: an empty selection, the result is NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                mins = np.nanmin(values, axis=1)
+                medians = np.nanmedian(values, axis=1)
+                maxs = np.nanmax(values, axis=1)
+
+            for i in range(len(group)):
+                n, s1, s2, s3, s4 = powers[i]
+                stats = {'min': mins[i], 'median': medians[i], 'max': maxs[i]}
+                stats.update(moment_stats(int(round(n)), s1, s2, s3, s4, shift + means[i]))
+                results[start + i][c] = [stats[s] for s in stat_list]
+
+    return [pd.DataFrame(r, index=stat_list, columns=columns) for r in results]
+
+
+def group_stats(data: pd.DataFrame,
+                by: str,
+                columns: list,
+                stat_list: list) -> pd.DataFrame:
+    """Statistics of each group of rows with the same value of column by.
+
+    Returns a DataFrame indexed by (group, stat), with a block in the layout
+    of StatsEngine.agg() for each group. Missing values of by are not a
+    group.
+    """
+    frame = {by: data[by]}
+    spec = {}
+    for i, c in enumerate(columns):
+        v = data[c].to_numpy(dtype='float64', na_value=np.nan)
+
+        # powers about the mean of each group (a first groupby pass).
+        # NaN powers are skipped by sum(), like the invalid rows of the engine
+        means = pd.Series(v, index=data.index).groupby(data[by], observed=True).transform('mean')
+        x = v - means.to_numpy()
+        x2 = x * x
+        frame[c] = v
+        frame[f'_{i}_s1'] = x
+        frame[f'_{i}_s2'] = x2
+        frame[f'_{i}_s3'] = x2 * x
+        frame[f'_{i}_s4'] = x2 * x2
+        spec[c] = ['count', 'mean', 'min', 'median', 'max']
+        for p in range(1, 5):
+            spec[f'_{i}_s{p}'] = 'sum'
+
+    grouped = pd.DataFrame(frame, index=data.index).groupby(by, observed=True, sort=True)
+    result = grouped.agg(spec)
+
+    rows = {}
+    for i, c in enumerate(columns):
+        counts = result[(c, 'count')].to_numpy()
+        sums = np.column_stack([result[(f'_{i}_s{p}', 'sum')].to_numpy() for p in range(1, 5)])
+        extremes = {s: result[(c, s)].to_numpy() for s in ['min', 'median', 'max']}
+        means = result[(c, 'mean')].to_numpy()
+
+        rows[c] = []
+        for g in range(len(result)):
+            stats = {s: extremes[s][g] for s in extremes}
+            shift = means[g] if counts[g] else 0.0
+            stats.update(moment_stats(int(counts[g]), *sums[g], shift))
+            rows[c].extend(stats[s] for s in stat_list)
+
+    index = pd.MultiIndex.from_product([result.index, stat_list], names=[by, 'stat'])
+
+    return pd.DataFrame(rows, index=index, columns=columns)
+
+
+def group_stats_parallel(data: pd.DataFrame,
+                         by: str,
+                         columns: list,
+                         stat_list: list,
+                         executor: object,
+                         nparts: int) -> pd.DataFrame:
+    """group_stats() in a process pool: each of nparts processes gets whole groups."""
+    codes = pd.factorize(data[by], sort=True)[0]
+    # missing values (code -1) are not a group, in any part
+    part = codes % nparts
+    subsets = [data[part == i] for i in range(nparts)]
+
+    results = executor.map(group_stats, subsets,
+                           [by] * nparts, [columns] * nparts, [stat_list] * nparts)
+    result = pd.concat(list(results))
+
+    # groups in sorted order, as from a single groupby
+    order = np.argsort(pd.factorize(result.index.get_level_values(0), sort=True)[0],
+                       kind='stable')
+
+    return result.iloc[order]
@@ -0,0 +1,113 @@
+"""
+program: worker.py
+
+purpose: run data work (filtering, statistics, plot data preparation) on a
+         worker thread, and deliver the results on the tkinter thread.
+
+comments: tkinter must only be used from the thread that runs mainloop, so
+          results are not passed to callbacks directly from the worker: they
+          go on a queue, which is read by a root.after() callback.
+
+          Each task has a kind, e.g. 'filter' or 'plot'. A new task of the
+          same kind supersedes the older one: if the older task has not
+          started, it is cancelled; if it is running, it finishes, but its
+          result is discarded. (A running Python thread can't be stopped.)
+
+          With the default single worker, tasks run in the order they are
+          submitted. That matters when tasks share state, such as a
+          StatsEngine, which must not be updated from two threads at once.
+
+author: Russell Folks
+
+history:
+-------
+10-18-2026  creation
+"""
+
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskRunner:
+    """Worker-thread executor with results marshalled back via root.after."""
+
+    def __init__(self, root: object,
+                 max_workers: int = 1,
+                 on_busy: callable = None,
+                 on_error: callable = None,
+                 poll_ms: int = 20):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='worker')
+        self.on_busy = on_busy
+        self.on_error = on_error
+        self.poll_ms = poll_ms
+
+        self.results = queue.Queue()
+        self.latest = {}     # kind: sequence number of the newest task
+        self.pending = {}    # kind: future of the newest task
+        self.sequence = 0
+        self.outstanding = 0
+        self.polling = False
+
+    def submit(self, kind: str, fn: callable, *args,
+               on_done: callable = None) -> None:
+        """Run fn(*args) on the worker; call on_done(result) on the Tk thread."""
+        self.sequence += 1
+        seq = self.sequence
+        self.latest[kind] = seq
+
+        older = self.pending.get(kind)
+        if older is not None:
+            older.cancel()
+
+        future = self.executor.submit(fn, *args)
+        self.pending[kind] = future
+
+        self.outstanding += 1
+        if self.outstanding == 1 and self.on_busy is not None:
+            self.on_busy(True)
+
+        # on_done callbacks may submit tasks while _poll is running
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+        future.add_done_callback(
+            lambda f: self.results.put((kind, seq, f, on_done)))
+
+    def busy(self) -> bool:
+        return self.outstanding > 0
+
+    def _poll(self) -> None:
+        while True:
+            try:
+                kind, seq, future, on_done = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            self.outstanding -= 1
+            if self.pending.get(kind) is future:
+                del self.pending[kind]
+
+            # superseded by a newer task of the same kind
+            if future.cancelled() or seq != self.latest[kind]:
+                continue
+
+            exc = future.exception()
+            if exc is not None:
+                if self.on_error is not None:
+                    self.on_error(exc)
+                else:
+                    # like tkinter does for an exception in a callback
+                    traceback.print_exception(exc)
+            elif on_done is not None:
+                on_done(future.result())
+
+        if self.outstanding > 0:
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self.polling = False
+            if self.on_busy is not None:
+                self.on_busy(False)